@@ -0,0 +1,64 @@
+import sys
+import time
+
+import numpy as np
+import pyautogui
+
+from core.platform import x11_shm
+
+USAGE = " [<display>] [-n <iterations>]"
+
+
+def printLatency(name, times):
+    times = np.array(times) * 1000
+    print(
+        f"{name}: mean {np.mean(times):.3f} ms, p50 {np.percentile(times, 50):.3f} ms, p95 {np.percentile(times, 95):.3f} ms"
+    )
+
+
+argv = sys.argv
+iterations = 50
+if "-n" in argv:
+    i = argv.index("-n")
+    if len(argv) <= i + 1 or not argv[i + 1].isdigit():
+        print("Usage: py " + argv[0] + USAGE)
+        sys.exit()
+    iterations = int(argv[i + 1])
+    argv = argv[:i] + argv[i + 2 :]
+
+displayName = argv[1] if len(argv) > 1 else None
+
+try:
+    capture = x11_shm.XShmCapture(displayName)
+except RuntimeError as e:
+    print("MIT-SHM capture unavailable: " + str(e))
+    sys.exit()
+
+width, height = capture.size
+buffer = np.empty((height, width, 3), dtype=np.uint8)
+regions = [
+    ("full screen", (0, 0, width, height)),
+    ("quarter", (0, 0, width // 2, height // 2)),
+    ("ocr segment", (width // 2, 0, width // 10, height // 25)),
+]
+
+print(f"display {displayName or 'default'}: {width}x{height}, {iterations} iterations")
+for name, region in regions:
+    out = buffer[: region[3], : region[2]]
+    times = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        capture.grab(region, out)
+        times.append(time.perf_counter() - start)
+    printLatency("MIT-SHM " + name, times)
+
+    # pyautogui uses the default display
+    if displayName is None:
+        times = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            np.array(pyautogui.screenshot(region=region))[:, :, ::-1].copy()
+            times.append(time.perf_counter() - start)
+        printLatency("pyautogui " + name, times)
+
+capture.close()
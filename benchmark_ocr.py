@@ -0,0 +1,224 @@
+import json
+import os
+import re
+import sys
+import time
+from os.path import exists
+
+import cv2
+import numpy as np
+
+import ocr
+from core.config.loader import allImageAreas
+from core.ocr.glyph_memo import GlyphMemo
+from utils.position import convertPositionsInString, getResolutionString
+
+USAGE = " [<crop directory>] [-n <iterations>] [-b <numpy|keras>] [-a <min accuracy>]"
+
+
+def getOcrSegmentsForResolution(resolution):
+    areas = allImageAreas["2560x1440"]["ocr_segments"]
+    return json.loads(
+        convertPositionsInString(json.dumps(areas), (2560, 1440), resolution)
+    )
+
+
+def getResolutionFromPath(path):
+    for part in reversed(os.path.normpath(path).split(os.sep)):
+        match = re.fullmatch(r"(\d+)x(\d+)", part)
+        if match:
+            return (int(match.group(1)), int(match.group(2)))
+    return (2560, 1440)
+
+
+def loadCropCorpus(directory):
+    """
+    Load all .png crops below directory. The resolution is taken from a <width>x<height> folder in the path.
+
+    Expected texts are read from labels.json in directory (relative path -> text, e. g. {"2560x1440/round/1.png": "12/100"}),
+    crops without label are only used for measuring latency.
+    """
+    labels = {}
+    if exists(directory + "/labels.json"):
+        with open(directory + "/labels.json") as f:
+            labels = json.load(f)
+    crops = []
+    for root, _, files in os.walk(directory):
+        for filename in sorted(files):
+            if filename.endswith(".png"):
+                path = os.path.join(root, filename)
+                relativePath = os.path.relpath(path, directory).replace(os.sep, "/")
+                crops.append(
+                    (
+                        path,
+                        cv2.imread(path),
+                        getResolutionFromPath(path),
+                        labels.get(relativePath),
+                    )
+                )
+    return crops
+
+
+def cutReferenceCrops():
+    """Cut money and round segments out of the ingame reference screenshots in images/."""
+    crops = []
+    for resolutionString in sorted(os.listdir("images")):
+        for name in ["ingame", "game_paused", "game_playing_fast", "game_playing_slow"]:
+            path = "images/" + resolutionString + "/" + name + ".png"
+            if not exists(path):
+                continue
+            img = cv2.imread(path)
+            resolution = (img.shape[1], img.shape[0])
+            segments = getOcrSegmentsForResolution(resolution)
+            for segment in ["money", "round", "round_ge100_rounds"]:
+                area = segments[segment]
+                crops.append(
+                    (
+                        path + ":" + segment,
+                        img[area[1] : area[3], area[0] : area[2]].copy(),
+                        resolution,
+                        None,
+                    )
+                )
+    return crops
+
+
+def printLatency(name, times):
+    times = np.array(times) * 1000
+    print(
+        f"{name}: mean {np.mean(times):.3f} ms, p50 {np.percentile(times, 50):.3f} ms, p95 {np.percentile(times, 95):.3f} ms, {1000 / np.mean(times):.1f} crops/s"
+    )
+
+
+def benchmarkGlyphExtraction(crops, iterations):
+    times = []
+    glyphs = 0
+    for _, crop, resolution, _ in crops:
+        for _ in range(iterations):
+            img = crop.copy()
+            start = time.perf_counter()
+            result = ocr.extract_glyphs(img, resolution)
+            times.append(time.perf_counter() - start)
+        glyphs += len(result)
+    print(f"crops: {len(crops)}, glyphs found: {glyphs}, iterations: {iterations}")
+    printLatency("glyph extraction", times)
+
+
+def benchmarkBackend(backend, crops, iterations):
+    """
+    Run the complete OCR pipeline over all crops with the given backend.
+
+    The result cache is cleared before every call. Latency is measured once
+    with an empty glyph memo (every glyph is classified by the model) and
+    once with the glyph memo kept between calls (steady state while playing).
+
+    Returns:
+        accuracy over the labelled crops or None if no crop is labelled
+    """
+    ocr.ocr_model = ocr.load_ocr_backend(backend)
+    ocr.ocr_model.predict(np.zeros((1, 60, 60), dtype=np.uint8), verbose=0)
+
+    modelTimes = []
+    memoTimes = []
+    results = {}
+    for name, crop, resolution, _ in crops:
+        resolutionString = getResolutionString(resolution)
+        for _ in range(iterations):
+            ocr.ocr_cache.clear()
+            ocr.glyph_memos[resolutionString] = GlyphMemo()
+            img = crop.copy()
+            start = time.perf_counter()
+            results[name] = ocr.custom_ocr(img, resolution)
+            modelTimes.append(time.perf_counter() - start)
+        for _ in range(iterations):
+            ocr.ocr_cache.clear()
+            img = crop.copy()
+            start = time.perf_counter()
+            ocr.custom_ocr(img, resolution)
+            memoTimes.append(time.perf_counter() - start)
+
+    # memos of the benchmark must not be saved
+    ocr.glyph_memos.clear()
+    ocr.ocr_cache.clear()
+
+    print("backend: " + backend)
+    printLatency("  model", modelTimes)
+    printLatency("  glyph memo", memoTimes)
+
+    labelled = [crop for crop in crops if crop[3] is not None]
+    if len(labelled) == 0:
+        return None
+
+    correctBySegment = {}
+    for name, _, _, label in labelled:
+        segment = os.path.basename(os.path.dirname(name))
+        correct, total = correctBySegment.get(segment, (0, 0))
+        correctBySegment[segment] = (correct + (results[name] == label), total + 1)
+        if results[name] != label:
+            print(f"  {name}: expected {label}, detected {results[name]}")
+    for segment, (correct, total) in sorted(correctBySegment.items()):
+        print(f"  {segment}: {correct}/{total} correct")
+    accuracy = sum(correct for correct, _ in correctBySegment.values()) / len(labelled)
+    print(f"  accuracy: {accuracy * 100:.2f}%")
+    return accuracy
+
+
+def popOption(argv, flag):
+    if flag not in argv:
+        return argv, None
+    i = argv.index(flag)
+    if len(argv) <= i + 1:
+        print("Usage: py " + argv[0] + USAGE)
+        sys.exit()
+    return argv[:i] + argv[i + 2 :], argv[i + 1]
+
+
+argv = sys.argv
+argv, iterations = popOption(argv, "-n")
+argv, backend = popOption(argv, "-b")
+argv, minAccuracy = popOption(argv, "-a")
+
+if (
+    (iterations is not None and not iterations.isdigit())
+    or (backend is not None and backend not in ocr.OCR_BACKENDS)
+    or (minAccuracy is not None and not re.fullmatch(r"\d+(\.\d+)?", minAccuracy))
+):
+    print("Usage: py " + argv[0] + USAGE)
+    sys.exit()
+iterations = int(iterations) if iterations is not None else 100
+
+if len(argv) > 1:
+    if not exists(argv[1]):
+        print("Directory not found!")
+        sys.exit()
+    crops = loadCropCorpus(argv[1])
+else:
+    crops = cutReferenceCrops()
+
+if len(crops) == 0:
+    print("no crops found!")
+    sys.exit()
+
+benchmarkGlyphExtraction(crops, iterations)
+
+backends = [backend] if backend else ocr.OCR_BACKENDS
+accuracies = {}
+for backend in backends:
+    modelFile = ocr.OCR_MODEL_NUMPY if backend == "numpy" else ocr.OCR_MODEL_KERAS
+    if not exists(modelFile):
+        print("backend: " + backend + ", skipped (" + modelFile + " not found)")
+        continue
+    try:
+        accuracies[backend] = benchmarkBackend(backend, crops, iterations)
+    except ImportError as e:
+        print("backend: " + backend + ", skipped (" + str(e) + ")")
+
+if minAccuracy is not None:
+    failed = [
+        backend
+        for backend, accuracy in accuracies.items()
+        if accuracy is not None and accuracy * 100 < float(minAccuracy)
+    ]
+    if len(failed):
+        print("accuracy below " + minAccuracy + "% for: " + ", ".join(failed))
+        sys.exit(1)
@@ -0,0 +1,205 @@
+import os
+import sys
+import time
+from os.path import exists
+
+import cv2
+import numpy as np
+
+from core.automation.screen import (
+    COMPARED_SCREENS,
+    REDUCED_MATCH_DIFF,
+    compareScreenRoi,
+    cropComparisonRois,
+    recognizeScreen,
+)
+from core.automation.screen_batch import ScreenBatchComparator
+from core.automation.screen_hash import ScreenHashIndex
+from core.config.loader import getImageAreas
+
+USAGE = " [<screenshot directory>] [-n <iterations>] [-gs <factor>]"
+# screens whose diffs differ by less are treated as matching equally well
+EQUAL_MATCH_TOLERANCE = 1e-6
+
+
+def loadComparisonRois(resolutionString, reduceFactor=None):
+    imagesDir = "images/" + resolutionString + "/"
+    comparisonImages = {"screens": {}}
+    for _, name in COMPARED_SCREENS:
+        if exists(imagesDir + name + ".png"):
+            comparisonImages["screens"][name] = cv2.imread(imagesDir + name + ".png")
+    resolution = tuple(int(value) for value in resolutionString.split("x"))
+    return cropComparisonRois(comparisonImages, getImageAreas(resolution), reduceFactor)
+
+
+def loadScreenshots(directory, resolution):
+    """All .png files in directory with exactly the given resolution."""
+    screenshots = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".png"):
+            continue
+        img = cv2.imread(directory + "/" + filename)
+        if img is not None and (img.shape[1], img.shape[0]) == resolution:
+            screenshots.append((filename, img))
+    return screenshots
+
+
+def measure(recognize, screenshots, iterations):
+    times = []
+    results = {}
+    for filename, img in screenshots:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            results[filename] = recognize(img)
+            times.append(time.perf_counter() - start)
+    return results, np.array(times) * 1000
+
+
+def printReducedDiffs(comparisonRois, reducedRois, screenshots, templateResults):
+    """
+    Diffs of the reduced comparison on screenshots recognized by recognizeScreen.
+
+    The largest diff to the matching screen and the smallest diff to any
+    other screen show the range REDUCED_MATCH_DIFF has to be in. Screens
+    whose full colour areas match as well (e. g. screens sharing their
+    compare area) aren't counted as other screens.
+    """
+    matching = []
+    others = []
+    for filename, img in screenshots:
+        expected = templateResults[filename]
+        for screenCfg, reducedCfg in zip(comparisonRois, reducedRois):
+            diff = compareScreenRoi(img, reducedCfg)
+            if screenCfg[0] == expected:
+                matching.append((diff, filename))
+            elif compareScreenRoi(img, screenCfg) >= 0.05:
+                others.append((diff, filename))
+    if not matching:
+        return
+    maxMatching = max(matching)
+    minOther = min(others, default=(float("inf"), None))
+    print(
+        f"  reduced diffs: matching screen at most {maxMatching[0]:.4f} ({maxMatching[1]}), other screens at least {minOther[0]:.4f} ({minOther[1]}), REDUCED_MATCH_DIFF {REDUCED_MATCH_DIFF}"
+    )
+
+
+def printLatency(name, times):
+    print(
+        f"  {name}: mean {np.mean(times):.3f} ms, p50 {np.percentile(times, 50):.3f} ms, p95 {np.percentile(times, 95):.3f} ms"
+    )
+
+
+def benchmarkResolution(resolutionString, directory, iterations, reduceFactor):
+    comparisonRois = loadComparisonRois(resolutionString)
+    resolution = tuple(int(value) for value in resolutionString.split("x"))
+    screenshots = loadScreenshots(directory, resolution)
+    if len(comparisonRois) == 0 or len(screenshots) == 0:
+        return
+
+    hashIndex = ScreenHashIndex(comparisonRois)
+
+    templateResults, templateTimes = measure(
+        lambda img: recognizeScreen(img, comparisonRois, True),
+        screenshots,
+        iterations,
+    )
+    hashResults, hashTimes = measure(hashIndex.recognize, screenshots, iterations)
+    batchComparator = ScreenBatchComparator(comparisonRois)
+    batchResults, batchTimes = measure(
+        batchComparator.recognize, screenshots, iterations
+    )
+    engines = [
+        ("ScreenHashIndex", hashResults),
+        ("ScreenBatchComparator", batchResults),
+    ]
+    if reduceFactor:
+        reducedRois = loadComparisonRois(resolutionString, reduceFactor)
+        reducedResults, reducedTimes = measure(
+            lambda img: recognizeScreen(img, reducedRois, True),
+            screenshots,
+            iterations,
+        )
+        engines.append(("reduced by " + str(reduceFactor), reducedResults))
+
+    unique = 0
+    for _, img in screenshots:
+        distances, colorMatches = hashIndex.distances(img)
+        candidates = colorMatches & (distances <= hashIndex.ambiguousDistance)
+        if (
+            candidates.sum() == 1
+            and distances[candidates].min() <= hashIndex.maxDistance
+        ):
+            unique += 1
+
+    print(
+        f"{resolutionString}: {len(screenshots)} screenshots, {len(comparisonRois)} reference screens"
+    )
+    printLatency("recognizeScreen", templateTimes)
+    printLatency("ScreenHashIndex", hashTimes)
+    printLatency("ScreenBatchComparator", batchTimes)
+    if reduceFactor:
+        printLatency("reduced by " + str(reduceFactor), reducedTimes)
+        print(
+            f"  reference crops: {sum(roi.nbytes for _, roi, _, _ in comparisonRois)} bytes, reduced: {sum(roi.nbytes for _, roi, _, _ in reducedRois)} bytes"
+        )
+        printReducedDiffs(comparisonRois, reducedRois, screenshots, templateResults)
+    print(
+        f"  recognized by hash alone: {unique}/{len(screenshots)}, verified with matchTemplate: {len(screenshots) - unique}/{len(screenshots)}"
+    )
+    screenCfgs = {screenCfg[0]: screenCfg for screenCfg in comparisonRois}
+    for name, results in engines:
+        ties = 0
+        for filename, img in screenshots:
+            if templateResults[filename] != results[filename]:
+                tie = ""
+                if all(
+                    screen in screenCfgs
+                    for screen in (templateResults[filename], results[filename])
+                ):
+                    diffs = [
+                        compareScreenRoi(img, screenCfgs[screen])
+                        for screen in (templateResults[filename], results[filename])
+                    ]
+                    # equal matches only told apart by rounding errors
+                    if abs(diffs[0] - diffs[1]) < EQUAL_MATCH_TOLERANCE:
+                        tie = f" (equal matches, diffs {diffs[0]:.2g} and {diffs[1]:.2g})"
+                        ties += 1
+                print(
+                    f"  {filename}: recognizeScreen {templateResults[filename].name}, {name} {results[filename].name}{tie}"
+                )
+        agreeing = sum(
+            templateResults[filename] == results[filename]
+            for filename, _ in screenshots
+        )
+        print(
+            f"  identical results ({name}): {agreeing}/{len(screenshots)}, equal matches decided differently: {ties}"
+        )
+
+
+argv = sys.argv
+iterations = 100
+reduceFactor = None
+for flag in ["-n", "-gs"]:
+    if flag in argv:
+        i = argv.index(flag)
+        if len(argv) <= i + 1 or not argv[i + 1].isdigit():
+            print("Usage: py " + argv[0] + USAGE)
+            sys.exit()
+        if flag == "-n":
+            iterations = int(argv[i + 1])
+        else:
+            reduceFactor = max(1, int(argv[i + 1]))
+        argv = argv[:i] + argv[i + 2 :]
+
+if len(argv) > 1:
+    if not exists(argv[1]):
+        print("Directory not found!")
+        sys.exit()
+    # screenshots of any resolution with reference images
+    for resolutionString in sorted(os.listdir("images")):
+        benchmarkResolution(resolutionString, argv[1], iterations, reduceFactor)
+else:
+    for resolutionString in sorted(os.listdir("images")):
+        benchmarkResolution(
+            resolutionString, "images/" + resolutionString, iterations, reduceFactor
+        )
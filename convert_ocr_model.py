@@ -0,0 +1,24 @@
+import os
+import sys
+from os.path import exists
+
+from core.ocr.numpy_net import export_keras_model
+
+if len(sys.argv) > 3:
+    print("Usage: py " + sys.argv[0] + " [<keras model> [<output file>]]")
+    sys.exit()
+
+modelFile = sys.argv[1] if len(sys.argv) > 1 else "btd6_ocr_net.h5"
+outputFile = (
+    sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(modelFile)[0] + ".npz"
+)
+
+if not exists(modelFile):
+    print(modelFile + " not found!")
+    sys.exit()
+
+os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
+import keras
+
+export_keras_model(keras.models.load_model(modelFile), outputFile)
+print("exported " + modelFile + " to " + outputFile + "!")
@@ -0,0 +1,239 @@
+"""Screen capture into preallocated buffers"""
+
+import threading
+import time
+
+import numpy as np
+
+from core.automation.input import grabsRegions, screenshotRegion
+
+
+def mergeAreas(areas, maxExtraPixels=4096):
+    """
+    Merge areas into fewer bounding boxes.
+
+    Two areas are merged if their bounding box contains at most
+    maxExtraPixels pixels more than both areas, so close areas are grabbed
+    at once while distant ones are grabbed separately.
+
+    Args:
+        areas: list of [x0, y0, x1, y1] (inclusive)
+        maxExtraPixels: maximum number of pixels captured additionally per merge
+
+    Returns:
+        list of merged (x0, y0, x1, y1)
+    """
+
+    def size(area):
+        return (area[2] - area[0] + 1) * (area[3] - area[1] + 1)
+
+    merged = [tuple(area) for area in areas]
+    i = 0
+    while i < len(merged):
+        for j in range(i + 1, len(merged)):
+            a = merged[i]
+            b = merged[j]
+            box = (
+                min(a[0], b[0]),
+                min(a[1], b[1]),
+                max(a[2], b[2]),
+                max(a[3], b[3]),
+            )
+            if size(box) - size(a) - size(b) <= maxExtraPixels:
+                merged[i] = box
+                del merged[j]
+                # the bigger box might be mergeable with areas checked before
+                i = -1
+                break
+        i += 1
+    return merged
+
+
+class RoiCapture:
+    """
+    Captures only the given areas of the screen into a preallocated frame.
+
+    The frame has the size of the screen, so areas are read with the same
+    coordinates as from a full screenshot. Pixels outside of the captured
+    areas are left over from earlier captures and must not be evaluated.
+
+    If the input driver can't grab regions natively (see
+    InputDriver.grabs_regions), every region would cost a full screenshot,
+    so the whole screen is captured once instead.
+    """
+
+    def __init__(self, resolution, maxExtraPixels=4096, native=None):
+        """
+        Args:
+            resolution: (width, height) of the screen
+            maxExtraPixels: see mergeAreas
+            native: whether regions are grabbed separately, defaults to
+                whether the input driver grabs regions natively
+        """
+        self.resolution = resolution
+        self.maxExtraPixels = maxExtraPixels
+        self.native = grabsRegions() if native is None else native
+        self.frame = np.zeros((resolution[1], resolution[0], 3), dtype=np.uint8)
+        self._regions = {}
+
+    def getRegions(self, areas):
+        """Merged regions for areas, cached as the same areas are captured every tick."""
+        key = tuple(tuple(area) for area in areas)
+        if key not in self._regions:
+            self._regions[key] = mergeAreas(areas, self.maxExtraPixels)
+        return self._regions[key]
+
+    def capture(self, areas):
+        """
+        Capture areas into the frame.
+
+        Args:
+            areas: list of [x0, y0, x1, y1] (inclusive)
+
+        Returns:
+            the frame
+        """
+        if not self.native:
+            return screenshotRegion(
+                (0, 0, self.resolution[0], self.resolution[1]), self.frame
+            )
+        for x0, y0, x1, y1 in self.getRegions(areas):
+            screenshotRegion(
+                (x0, y0, x1 - x0 + 1, y1 - y0 + 1),
+                self.frame[y0 : y1 + 1, x0 : x1 + 1],
+            )
+        return self.frame
+
+    def capturedPixels(self, areas):
+        """Number of pixels captured per call of capture(areas)."""
+        if not self.native:
+            return self.resolution[0] * self.resolution[1]
+        return sum(
+            (x1 - x0 + 1) * (y1 - y0 + 1) for x0, y0, x1, y1 in self.getRegions(areas)
+        )
+
+
+class CaptureService:
+    """
+    Captures frames in a background thread into a ring buffer.
+
+    Frames are written into preallocated slots. The consumer takes the
+    newest frame without waiting for a capture, so a tick only takes as
+    long as processing the frame. The slot handed out last is never
+    overwritten until the next frame is taken, so at least 3 slots are
+    needed for the thread to always have a free one.
+    """
+
+    def __init__(self, capture, shape, size=3, interval=0.02):
+        """
+        Args:
+            capture: function writing a BGR frame into the array passed to it
+            shape: shape of the frames (height, width, 3)
+            size: number of slots of the ring buffer
+            interval: minimum number of seconds between the start of two
+                captures, so the thread doesn't take all CPU time
+        """
+        if size < 3:
+            raise ValueError("at least 3 slots are needed")
+        self.capture = capture
+        self.interval = interval
+        self.frames = np.empty((size,) + tuple(shape), dtype=np.uint8)
+        self.timestamps = np.zeros(size)
+        self.captured = 0
+        self.error = None
+        self._newest = None
+        self._inUse = None
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._lastTimestamp = None
+
+    def start(self):
+        """Start capturing in a daemon thread."""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop capturing and wait for the thread to finish."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def latest(self, newerThan=None):
+        """
+        Take the newest frame without blocking.
+
+        The frame stays valid until the next frame is taken.
+
+        Args:
+            newerThan: timestamp of the frame taken before
+
+        Returns:
+            tuple of frame and timestamp (time.time() at the start of the
+            capture) or None if there is no frame newer than newerThan
+        """
+        with self._condition:
+            return self._take(newerThan)
+
+    def waitForFrame(self, newerThan=None, timeout=1):
+        """
+        Like latest, but waits up to timeout seconds for a newer frame.
+
+        Raises:
+            RuntimeError: If the capture thread stopped because of an error
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: (
+                    self.error is not None
+                    or (
+                        self._newest is not None
+                        and (
+                            newerThan is None
+                            or self.timestamps[self._newest] > newerThan
+                        )
+                    )
+                ),
+                timeout,
+            )
+            if self.error is not None:
+                raise RuntimeError("capture thread failed") from self.error
+            return self._take(newerThan)
+
+    def _take(self, newerThan):
+        if self._newest is None:
+            return None
+        timestamp = self.timestamps[self._newest]
+        if newerThan is not None and timestamp <= newerThan:
+            return None
+        self._inUse = self._newest
+        return self.frames[self._newest], timestamp
+
+    def _run(self):
+        while self._running:
+            with self._condition:
+                slot = next(
+                    i
+                    for i in range(len(self.frames))
+                    if i != self._newest and i != self._inUse
+                )
+            timestamp = time.time()
+            if self._lastTimestamp is not None:
+                time.sleep(max(0, self._lastTimestamp + self.interval - timestamp))
+                timestamp = time.time()
+            self._lastTimestamp = timestamp
+            try:
+                self.capture(self.frames[slot])
+            # any error is handed to the main thread, which raises it in waitForFrame
+            except Exception as e:  # noqa: BLE001
+                with self._condition:
+                    self.error = e
+                    self._condition.notify_all()
+                return
+            with self._condition:
+                self.timestamps[slot] = timestamp
+                self._newest = slot
+                self.captured += 1
+                self._condition.notify_all()
@@ -0,0 +1,74 @@
+"""Detection of unchanged frames"""
+
+import zlib
+
+import numpy as np
+
+
+class FrameChangeDetector:
+    """
+    Tells whether the monitored areas of a frame changed since the last frame.
+
+    A CRC32 checksum over every step-th pixel (in both directions) of the
+    monitored areas is compared with the checksum of the previous frame.
+    While a menu is open or the game is paused consecutive frames are
+    usually identical, so the results of the previous frame can be reused.
+    """
+
+    def __init__(self, step=2):
+        """
+        Args:
+            step: distance between sampled pixels. digits and the compare
+                areas are wider than 2 pixels, so a change is still noticed
+        """
+        self.step = step
+        self.skipped = 0
+        self.processed = 0
+        self._checksum = None
+        self._areasKey = None
+        self._indices = None
+        self._frameShape = None
+
+    def changed(self, img, areas):
+        """
+        Compare the frame with the previous one.
+
+        Args:
+            img: frame
+            areas: monitored areas, list of [x0, y0, x1, y1] (inclusive)
+
+        Returns:
+            False if the sampled pixels equal the ones of the previous frame
+            with the same areas, True otherwise
+        """
+        areasKey = tuple(tuple(area) for area in areas)
+        if areasKey != self._areasKey or img.shape != self._frameShape:
+            self._areasKey = areasKey
+            self._frameShape = img.shape
+            self._indices = self._getIndices(areas, img.shape[1])
+            self._checksum = None
+
+        checksum = zlib.crc32(
+            np.take(img.reshape(-1, img.shape[2]), self._indices, axis=0)
+        )
+        if checksum == self._checksum:
+            self.skipped += 1
+            return False
+        self._checksum = checksum
+        self.processed += 1
+        return True
+
+    def reset(self):
+        """Treat the next frame as changed."""
+        self._checksum = None
+
+    def stats(self):
+        """Number of frames skipped and processed since creation."""
+        return {"skipped": self.skipped, "processed": self.processed}
+
+    def _getIndices(self, areas, width):
+        indices = []
+        for x0, y0, x1, y1 in areas:
+            ys, xs = np.mgrid[y0 : y1 + 1 : self.step, x0 : x1 + 1 : self.step]
+            indices.append((ys * width + xs).ravel())
+        return np.concatenate(indices)
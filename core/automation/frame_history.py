@@ -0,0 +1,129 @@
+"""Bounded history of recent frames and decisions for debugging"""
+
+import os
+import time
+
+import cv2
+import numpy as np
+
+
+class FrameHistory:
+    """
+    Keeps the last frames of the main loop and what was decided on them.
+
+    Frames are shrunk by scale and written into a preallocated ring
+    buffer, so keeping the history costs one resize per tick and no disk
+    I/O. The history is only written to disk by dump, e. g. when an
+    objective fails. Dumps contain "frames" and "timestamps" like a
+    recording of RecordedSessionDriver, but the screen recognition needs
+    frames of the game's resolution, so only dumps taken with scale 1 can
+    be replayed with it.
+
+    If only parts of the screen are captured per tick (-rc), the rest of a
+    frame is left from earlier captures. The regions captured for each
+    frame are kept, everything outside of them may be stale.
+    """
+
+    def __init__(self, size=30, scale=0.25):
+        """
+        Args:
+            size: number of frames kept
+            scale: factor the frames are resized by
+        """
+        self.size = size
+        self.scale = scale
+        self.frames = None
+        self.timestamps = np.zeros(size)
+        self.states = [""] * size
+        self.screens = [""] * size
+        self.decisions = [""] * size
+        self.regions = [""] * size
+        self.count = 0
+
+    def add(self, img, state, screen, timestamp=None, regions=None):
+        """
+        Add a frame.
+
+        Args:
+            img: frame
+            state: State the frame is processed in
+            screen: Screen recognized on the frame
+            timestamp: time of the capture, defaults to now
+            regions: regions of the frame captured for it, list of
+                [x0, y0, x1, y1] (inclusive) of the full size frame. None if
+                the whole frame has been captured
+        """
+        if self.frames is None:
+            height = max(1, round(img.shape[0] * self.scale))
+            width = max(1, round(img.shape[1] * self.scale))
+            self.frames = np.zeros((self.size, height, width, 3), dtype=np.uint8)
+        slot = self.count % self.size
+        if self.scale == 1:
+            np.copyto(self.frames[slot], img)
+        else:
+            cv2.resize(
+                img,
+                (self.frames.shape[2], self.frames.shape[1]),
+                dst=self.frames[slot],
+                interpolation=cv2.INTER_AREA,
+            )
+        self.timestamps[slot] = time.time() if timestamp is None else timestamp
+        self.states[slot] = state.name
+        self.screens[slot] = screen.name
+        self.decisions[slot] = ""
+        self.regions[slot] = (
+            "all"
+            if regions is None
+            else ";".join(" ".join(str(v) for v in region) for region in regions)
+        )
+        self.count += 1
+
+    def annotate(self, decision):
+        """Set what was decided on the newest frame."""
+        if self.count:
+            self.decisions[(self.count - 1) % self.size] = decision
+
+    def nbytes(self):
+        """Memory used by the frames."""
+        return 0 if self.frames is None else self.frames.nbytes
+
+    def dump(self, directory, reason):
+        """
+        Write the history, oldest frame first, to a compressed .npz file.
+
+        Besides the frames and what was decided on them, "regions" holds
+        the regions captured for each frame as "x0 y0 x1 y1" separated by
+        ";" (or "all" for the whole frame).
+
+        Args:
+            directory: directory the file is created in
+            reason: why the history is dumped, part of the filename
+
+        Returns:
+            path of the file or None if there are no frames yet
+        """
+        if self.count == 0:
+            return None
+        order = [
+            i % self.size for i in range(max(0, self.count - self.size), self.count)
+        ]
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(
+            directory,
+            time.strftime("%Y-%m-%d_%H-%M-%S")
+            + "_"
+            + reason.replace(" ", "_")
+            + ".npz",
+        )
+        np.savez_compressed(
+            path,
+            frames=self.frames[order],
+            timestamps=self.timestamps[order],
+            states=np.array([self.states[i] for i in order]),
+            screens=np.array([self.screens[i] for i in order]),
+            decisions=np.array([self.decisions[i] for i in order]),
+            regions=np.array([self.regions[i] for i in order]),
+            reason=reason,
+            scale=self.scale,
+        )
+        return path
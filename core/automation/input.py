@@ -1,9 +1,22 @@
 """Input control utilities - now using platform abstraction layer"""
 
+import threading
+
+import pyautogui
+
 from core.platform.factory import get_input_driver
+from core.platform.focus import FocusTracker
 
 # Get the platform-specific input driver (singleton)
 _driver = get_input_driver()
+# the active window is queried at most every 0.5 seconds and again after any input
+_focus = FocusTracker(_driver)
+# captures share the driver's display connection and buffers (e. g. the
+# MIT-SHM segments on Linux), so the background capture thread (-bc) and
+# the main thread must not grab at the same time
+_captureLock = threading.Lock()
+# the clock to wait on and to take timestamps from, virtual when replaying a recorded session
+clock = _driver.clock
 
 
 def sendKey(key):
@@ -16,9 +29,72 @@ def sendKey(key):
     Args:
         key: Key to send (string or int scancode)
     """
+    _focus.invalidate()
     _driver.send_key(key)
 
 
+def screenshotRegion(region, out=None):
+    """
+    Capture a region of the screen as BGR array using the platform-specific driver.
+
+    Args:
+        region: (left, top, width, height) of the region
+        out: array of shape (height, width, 3) to write the pixels to
+    """
+    with _captureLock:
+        return _driver.screenshot_region(region, out)
+
+
+def grabsRegions():
+    """Check if the platform-specific driver grabs regions without capturing the whole screen."""
+    return _driver.grabs_regions()
+
+
+def captureScreen(out=None):
+    """
+    Capture the whole screen as BGR array using the platform-specific driver.
+
+    Args:
+        out: array of shape (height, width, 3) to write the pixels to
+    """
+    width, height = pyautogui.size()
+    with _captureLock:
+        return _driver.screenshot_region((0, 0, width, height), out)
+
+
+def click(pos=None):
+    """
+    Click using the platform-specific driver.
+
+    Args:
+        pos: (x, y) coordinates to click, None for the current position
+    """
+    _focus.invalidate()
+    _driver.click(pos)
+
+
+def moveTo(pos):
+    """
+    Move the mouse using the platform-specific driver.
+
+    Args:
+        pos: (x, y) coordinates to move to
+    """
+    _focus.invalidate()
+    _driver.move_to(pos)
+
+
+def executeSequence(steps):
+    """
+    Execute a sequence of input actions at once using the platform-specific driver.
+
+    Args:
+        steps: list of (action, argument), see InputDriver.execute_sequence
+    """
+    _focus.invalidate()
+    _driver.execute_sequence(steps)
+
+
 # Backward compatibility: expose the driver as 'ahk' for existing code
 # that accesses it directly (e.g., ahk.get_active_window())
 class _DriverProxy:
@@ -39,11 +115,12 @@ class _DriverProxy:
             def __init__(self, title):
                 self.title = title
 
-        title = _driver.get_active_window_title()
+        title = _focus.get_active_window_title()
         return WindowInfo(title) if title else None
 
     def send(self, key, key_delay=15, key_press_duration=30, send_mode="Event"):
         """Send key (backward compatibility)."""
+        _focus.invalidate()
         _driver.send_key(key, delay=key_delay, duration=key_press_duration)
 
 
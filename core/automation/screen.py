@@ -5,7 +5,7 @@ import copy
 from core.constants import Screen
 from core.config.loader import imageAreas
 from core.automation.image import cutImage
-from core.automation.input import ahk
+from core.automation.input import ahk, clock, screenshotRegion
 
 
 def isBTD6Window(name):
@@ -26,101 +26,190 @@ def getIngameOcrSegments(mapConfig):
     }
 
 
-def recognizeScreen(img, comparisonImages, ignoreFocus=False):
+def cutOcrSegments(img, segmentCoordinates, segments=None):
+    return {
+        segment: img[
+            segmentCoordinates[segment][1] : segmentCoordinates[segment][3],
+            segmentCoordinates[segment][0] : segmentCoordinates[segment][2],
+        ]
+        for segment in (segments if segments is not None else segmentCoordinates)
+    }
+
+
+def captureOcrSegment(segmentCoordinates, segment):
+    """Take a screenshot of only the given OCR segment."""
+    area = segmentCoordinates[segment]
+    return screenshotRegion((area[0], area[1], area[2] - area[0], area[3] - area[1]))
+
+
+# screens recognized by recognizeScreen in the order they are compared
+# (name of the reference image / compare area)
+COMPARED_SCREENS = [
+    (Screen.STARTMENU, "startmenu"),
+    (Screen.MAP_SELECTION, "map_selection"),
+    (Screen.DIFFICULTY_SELECTION, "difficulty_selection"),
+    (Screen.GAMEMODE_SELECTION, "gamemode_selection"),
+    (Screen.HERO_SELECTION, "hero_selection"),
+    (Screen.INGAME, "ingame"),
+    (Screen.INGAME_PAUSED, "ingame_paused"),
+    (Screen.VICTORY_SUMMARY, "victory_summary"),
+    (Screen.VICTORY, "victory"),
+    (Screen.DEFEAT, "defeat"),
+    (Screen.OVERWRITE_SAVE, "overwrite_save"),
+    (Screen.LEVELUP, "levelup"),
+    (Screen.APOPALYPSE_HINT, "apopalypse_hint"),
+    (Screen.INSTA_GRANTED, "insta_granted"),
+    (Screen.INSTA_CLAIMED, "insta_claimed"),
+    (Screen.COLLECTION_CLAIM_CHEST, "collection_claim_chest"),
+]
+
+
+# thresholds when comparing reduced areas (see reduceRoi). experimental: only
+# checked against the reference images in images/ (for factors 1 to 4
+# matching screens diff by at most 0.011, all other screens by at least
+# 0.026), not against captures of the running game. benchmark_screen_recognition.py
+# -gs reports the diffs on recorded screenshots to calibrate them
+REDUCED_MATCH_DIFF = 0.015
+REDUCED_CONFIDENT_MATCH_DIFF = 0.01
+
+
+def reduceRoi(img, factor):
+    """Convert an area to grayscale and shrink it by factor (single rows or columns are kept)."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    if factor > 1:
+        gray = cv2.resize(
+            gray,
+            (max(1, gray.shape[1] // factor), max(1, gray.shape[0] // factor)),
+            interpolation=cv2.INTER_AREA,
+        )
+    return gray
+
+
+def cropComparisonRois(comparisonImages, areas, reduceFactor=None):
+    """
+    Crop the compared area out of each reference screen once.
+
+    Args:
+        comparisonImages: reference images as loaded by getResolutionDependentData
+        areas: image areas for the resolution of the reference images
+        reduceFactor: if set, crops are converted to grayscale and shrunk by
+            this factor (see reduceRoi). The live frame is reduced the same way
+            when comparing
+
+    Returns:
+        list of (screen, reference crop, compare area, reduceFactor) in the
+        order of COMPARED_SCREENS, screens without reference image are left out.
+        cutImage copies, so each crop is a small contiguous array
+    """
+    comparisonRois = []
+    for screen, name in COMPARED_SCREENS:
+        if name not in comparisonImages["screens"]:
+            continue
+        area = areas["compare"]["screens"][name]
+        roi = cutImage(comparisonImages["screens"][name], area)
+        if reduceFactor:
+            roi = reduceRoi(roi, reduceFactor)
+        comparisonRois.append((screen, roi, area, reduceFactor))
+    return comparisonRois
+
+
+# a likely screen matching at least this well is accepted without comparing the others
+CONFIDENT_MATCH_DIFF = 0.02
+
+
+def compareScreenRoi(img, screenCfg):
+    area = screenCfg[2]
+    # only a view of the screenshot, no copy
+    crop = img[area[1] : area[3] + 1, area[0] : area[2] + 1]
+    if screenCfg[3]:
+        crop = reduceRoi(crop, screenCfg[3])
+    return cv2.matchTemplate(crop, screenCfg[1], cv2.TM_SQDIFF_NORMED)[0][0]
+
+
+def recognizeScreen(
+    img, comparisonRois, ignoreFocus=False, likelyScreens=None, recognizer=None
+):
+    """
+    Detect the screen BTD6 is currently showing.
+
+    Args:
+        img: screenshot
+        comparisonRois: reference crops as returned by cropComparisonRois
+        ignoreFocus: don't return Screen.BTD6_UNFOCUSED if BTD6 isn't the active window
+        likelyScreens: screens to compare first, the first one matching with a
+            diff below CONFIDENT_MATCH_DIFF (REDUCED_CONFIDENT_MATCH_DIFF for
+            reduced crops) is returned right away. All other screens are only
+            compared if none of them does
+        recognizer: ScreenHashIndex or ScreenBatchComparator to recognize the
+            screen with instead of comparing the reference crops one by one
+    """
     screen = Screen.UNKNOWN
-    activeWindow = ahk.get_active_window()
+    activeWindow = None if ignoreFocus else ahk.get_active_window()
     if not ignoreFocus and (not activeWindow or not isBTD6Window(activeWindow.title)):
         screen = Screen.BTD6_UNFOCUSED
+    elif recognizer is not None:
+        screen = recognizer.recognize(img)
     else:
+        matchDiff = 0.05
+        confidentMatchDiff = CONFIDENT_MATCH_DIFF
+        if len(comparisonRois) and comparisonRois[0][3]:
+            matchDiff = REDUCED_MATCH_DIFF
+            confidentMatchDiff = REDUCED_CONFIDENT_MATCH_DIFF
+
+        diffs = {}
+        if likelyScreens:
+            screenCfgs = {screenCfg[0]: screenCfg for screenCfg in comparisonRois}
+            for likelyScreen in likelyScreens:
+                if likelyScreen not in screenCfgs or likelyScreen in diffs:
+                    continue
+                diffs[likelyScreen] = compareScreenRoi(img, screenCfgs[likelyScreen])
+                if diffs[likelyScreen] < confidentMatchDiff:
+                    return likelyScreen
+
         bestMatchDiff = None
-        for screenCfg in [
-            (
-                Screen.STARTMENU,
-                comparisonImages["screens"]["startmenu"],
-                imageAreas["compare"]["screens"]["startmenu"],
-            ),
-            (
-                Screen.MAP_SELECTION,
-                comparisonImages["screens"]["map_selection"],
-                imageAreas["compare"]["screens"]["map_selection"],
-            ),
-            (
-                Screen.DIFFICULTY_SELECTION,
-                comparisonImages["screens"]["difficulty_selection"],
-                imageAreas["compare"]["screens"]["difficulty_selection"],
-            ),
-            (
-                Screen.GAMEMODE_SELECTION,
-                comparisonImages["screens"]["gamemode_selection"],
-                imageAreas["compare"]["screens"]["gamemode_selection"],
-            ),
-            (
-                Screen.HERO_SELECTION,
-                comparisonImages["screens"]["hero_selection"],
-                imageAreas["compare"]["screens"]["hero_selection"],
-            ),
-            (
-                Screen.INGAME,
-                comparisonImages["screens"]["ingame"],
-                imageAreas["compare"]["screens"]["ingame"],
-            ),
-            (
-                Screen.INGAME_PAUSED,
-                comparisonImages["screens"]["ingame_paused"],
-                imageAreas["compare"]["screens"]["ingame_paused"],
-            ),
-            (
-                Screen.VICTORY_SUMMARY,
-                comparisonImages["screens"]["victory_summary"],
-                imageAreas["compare"]["screens"]["victory_summary"],
-            ),
-            (
-                Screen.VICTORY,
-                comparisonImages["screens"]["victory"],
-                imageAreas["compare"]["screens"]["victory"],
-            ),
-            (
-                Screen.DEFEAT,
-                comparisonImages["screens"]["defeat"],
-                imageAreas["compare"]["screens"]["defeat"],
-            ),
-            (
-                Screen.OVERWRITE_SAVE,
-                comparisonImages["screens"]["overwrite_save"],
-                imageAreas["compare"]["screens"]["overwrite_save"],
-            ),
-            (
-                Screen.LEVELUP,
-                comparisonImages["screens"]["levelup"],
-                imageAreas["compare"]["screens"]["levelup"],
-            ),
-            (
-                Screen.APOPALYPSE_HINT,
-                comparisonImages["screens"]["apopalypse_hint"],
-                imageAreas["compare"]["screens"]["apopalypse_hint"],
-            ),
-            (
-                Screen.INSTA_GRANTED,
-                comparisonImages["screens"]["insta_granted"],
-                imageAreas["compare"]["screens"]["insta_granted"],
-            ),
-            (
-                Screen.INSTA_CLAIMED,
-                comparisonImages["screens"]["insta_claimed"],
-                imageAreas["compare"]["screens"]["insta_claimed"],
-            ),
-            (
-                Screen.COLLECTION_CLAIM_CHEST,
-                comparisonImages["screens"]["collection_claim_chest"],
-                imageAreas["compare"]["screens"]["collection_claim_chest"],
-            ),
-        ]:
-            diff = cv2.matchTemplate(
-                cutImage(img, screenCfg[2]),
-                cutImage(screenCfg[1], screenCfg[2]),
-                cv2.TM_SQDIFF_NORMED,
-            )[0][0]
-            if diff < 0.05 and (bestMatchDiff is None or diff < bestMatchDiff):
+        for screenCfg in comparisonRois:
+            if screenCfg[0] in diffs:
+                diff = diffs[screenCfg[0]]
+            else:
+                diff = compareScreenRoi(img, screenCfg)
+            if diff < matchDiff and (bestMatchDiff is None or diff < bestMatchDiff):
                 bestMatchDiff = diff
                 screen = screenCfg[0]
     return screen
+
+
+def waitForScreen(
+    expected, capture, comparisonRois, timeout, interval=0.05, recognizer=None
+):
+    """
+    Wait until BTD6 shows one of the expected screens.
+
+    The screen has to be recognized on two consecutive captures, so nothing
+    is clicked while it is still fading in.
+
+    Args:
+        expected: Screen or list of Screens to wait for
+        capture: function returning a screenshot with (at least) the compare areas
+        comparisonRois: reference crops as returned by cropComparisonRois
+        timeout: maximum number of seconds to wait
+        interval: seconds between two captures
+        recognizer: see recognizeScreen
+
+    Returns:
+        the expected screen shown or None if it isn't shown within timeout
+    """
+    if isinstance(expected, Screen):
+        expected = [expected]
+    deadline = clock.monotonic() + timeout
+    lastScreen = None
+    while True:
+        screen = recognizeScreen(
+            capture(), comparisonRois, likelyScreens=expected, recognizer=recognizer
+        )
+        if screen in expected and screen == lastScreen:
+            return screen
+        lastScreen = screen
+        if clock.monotonic() >= deadline:
+            return None
+        clock.sleep(interval)
+
@@ -0,0 +1,134 @@
+"""Batched comparison of all compare areas in a single pass"""
+
+import numpy as np
+
+from core.constants import Screen
+
+
+class ScreenBatchComparator:
+    """
+    Screen recognition by comparing all compare areas at once.
+
+    The pixels of all compare areas are gathered from the frame into one
+    preallocated buffer and compared with the stacked reference crops in a
+    single vectorized pass. The score of each screen is the normalized
+    squared difference (cv2.TM_SQDIFF_NORMED) of its area, so the scores
+    equal the diffs of compareScreenRoi but need no cv2.matchTemplate call
+    per screen.
+
+    Like recognizeScreen, the first of equally matching screens in the order
+    of COMPARED_SCREENS is returned. Only screens whose diffs are equal here
+    but differ by rounding errors of cv2.matchTemplate can be recognized
+    differently (e. g. insta_granted and insta_claimed at 2560x1440, both
+    reference images match both compare areas exactly).
+    """
+
+    def __init__(self, comparisonRois, matchDiff=0.05):
+        """
+        Args:
+            comparisonRois: reference crops as returned by cropComparisonRois
+                (without reduceFactor)
+            matchDiff: score below which a screen counts as match
+
+        Raises:
+            ValueError: If the reference crops are reduced
+        """
+        if any(screenCfg[3] for screenCfg in comparisonRois):
+            raise ValueError("reduced reference crops can't be compared batched")
+        self.comparisonRois = comparisonRois
+        self.matchDiff = matchDiff
+        self.screens = [screenCfg[0] for screenCfg in comparisonRois]
+        self.screenValues = np.array([screen.value for screen in self.screens])
+        # difference between the best and the second best score of the last frame
+        self.lastMargin = None
+
+        ys = []
+        xs = []
+        references = []
+        offsets = []
+        for screenCfg in comparisonRois:
+            roi = screenCfg[1]
+            area = screenCfg[2]
+            gridY, gridX = np.mgrid[
+                area[1] : area[1] + roi.shape[0], area[0] : area[0] + roi.shape[1]
+            ]
+            offsets.append(sum(len(y) for y in ys))
+            ys.append(gridY.ravel())
+            xs.append(gridX.ravel())
+            references.append(roi.reshape(-1, roi.shape[2]))
+        self.ys = np.concatenate(ys)
+        self.xs = np.concatenate(xs)
+        self.offsets = np.array(offsets)
+        self.reference = np.concatenate(references).astype(np.float32)
+        self.referenceSquares = np.add.reduceat(
+            np.square(self.reference).sum(axis=1), self.offsets
+        )
+
+        # buffers reused for every frame
+        self._pixels = np.empty(self.reference.shape, dtype=np.uint8)
+        self._frame = np.empty(self.reference.shape, dtype=np.float32)
+        self._diff = np.empty(self.reference.shape, dtype=np.float32)
+        self._indices = None
+        self._frameWidth = None
+
+    def diffs(self, img):
+        """
+        Compare the frame with all reference screens.
+
+        Returns:
+            array with the normalized squared difference of each screen in
+            the order of comparisonRois
+        """
+        if self._frameWidth != img.shape[1]:
+            self._frameWidth = img.shape[1]
+            self._indices = self.ys * img.shape[1] + self.xs
+        np.take(img.reshape(-1, img.shape[2]), self._indices, axis=0, out=self._pixels)
+        np.copyto(self._frame, self._pixels)
+        np.subtract(self._frame, self.reference, out=self._diff)
+        np.square(self._diff, out=self._diff)
+        squaredDiffs = np.add.reduceat(self._diff.sum(axis=1), self.offsets)
+        np.square(self._frame, out=self._frame)
+        frameSquares = np.add.reduceat(self._frame.sum(axis=1), self.offsets)
+
+        denominators = np.sqrt(self.referenceSquares * frameSquares)
+        diffs = np.divide(
+            squaredDiffs,
+            denominators,
+            out=np.where(squaredDiffs > 0, 1, 0).astype(np.float32),
+            where=denominators > 0,
+        )
+        # cv2.matchTemplate clips the normalized difference to 1
+        return np.minimum(diffs, 1)
+
+    def scores(self, img):
+        """
+        Compare the frame with all reference screens.
+
+        Returns:
+            array indexed by Screen value with the normalized squared
+            difference of each screen, inf for screens without reference
+        """
+        scores = np.full(
+            max(screen.value for screen in Screen) + 1, np.inf, dtype=np.float32
+        )
+        scores[self.screenValues] = self.diffs(img)
+        return scores
+
+    def recognize(self, img):
+        """
+        Return the screen shown in img or Screen.UNKNOWN.
+
+        The difference between the best and the second best score is kept
+        in lastMargin.
+        """
+        diffs = self.diffs(img)
+        # argmin returns the first of equal diffs, diffs are in the order of COMPARED_SCREENS
+        best = int(np.argmin(diffs))
+        self.lastMargin = (
+            float(np.partition(diffs, 1)[1] - diffs[best])
+            if len(diffs) > 1
+            else float("inf")
+        )
+        if diffs[best] >= self.matchDiff:
+            return Screen.UNKNOWN
+        return self.screens[best]
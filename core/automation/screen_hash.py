@@ -0,0 +1,137 @@
+"""Perceptual hash index for screen recognition"""
+
+import numpy as np
+
+from core.automation.screen import compareScreenRoi
+from core.constants import Screen
+
+# gray value weights of the B, G and R channel
+GRAY_WEIGHTS = np.array([0.114, 0.587, 0.299], dtype=np.float32)
+
+
+def getSamplingGrid(area, size=(8, 9)):
+    """
+    Positions of a size[0] x size[1] grid spread over area.
+
+    The second axis runs along the longer side of the area so the gradient
+    of the difference hash is taken along it (most compare areas are a
+    single row or column of pixels).
+
+    Returns:
+        tuple of y and x coordinate arrays of shape size
+    """
+    x0, y0, x1, y1 = area
+    if x1 - x0 >= y1 - y0:
+        ys, xs = np.meshgrid(
+            np.linspace(y0, y1, size[0]), np.linspace(x0, x1, size[1]), indexing="ij"
+        )
+    else:
+        xs, ys = np.meshgrid(
+            np.linspace(x0, x1, size[0]), np.linspace(y0, y1, size[1]), indexing="ij"
+        )
+    return np.rint(ys).astype(np.intp), np.rint(xs).astype(np.intp)
+
+
+class ScreenHashIndex:
+    """
+    Screen recognition by difference hashes (dHash) of the compare areas.
+
+    For every reference screen the brightness gradients between 8 x 9
+    samples of its compare area and the mean colour of said area are
+    stored. A frame is hashed by sampling all compare areas with a single
+    gather and comparing all hashes at once, so adding screens hardly
+    increases the cost. cv2.matchTemplate is only used to decide between
+    screens whose hashes are all close to the frame.
+
+    Unlike a plain dHash the gradients aren't reduced to single bits, as
+    most compare areas are flat where the sign of a gradient is just noise.
+    """
+
+    def __init__(
+        self,
+        comparisonRois,
+        maxDistance=4,
+        ambiguousDistance=40,
+        maxGradientDiff=24,
+        maxColorDiff=20,
+    ):
+        """
+        Args:
+            comparisonRois: reference crops as returned by cropComparisonRois
+                (without reduceFactor)
+            maxDistance: number of differing gradients up to which a hash counts as match
+            ambiguousDistance: hashes up to this distance are verified with
+                cv2.matchTemplate if the match isn't unique
+            maxGradientDiff: gradients differing by more than this count as different
+            maxColorDiff: maximum difference of the mean colour per channel
+        """
+        self.comparisonRois = comparisonRois
+        self.maxDistance = maxDistance
+        self.ambiguousDistance = ambiguousDistance
+        self.maxGradientDiff = maxGradientDiff
+        self.maxColorDiff = maxColorDiff
+        self.screens = [screenCfg[0] for screenCfg in comparisonRois]
+
+        ys = []
+        xs = []
+        for screenCfg in comparisonRois:
+            gridY, gridX = getSamplingGrid(screenCfg[2])
+            ys.append(gridY)
+            xs.append(gridX)
+        self.ys = np.array(ys)
+        self.xs = np.array(xs)
+
+        # the reference crops start at the top left corner of their area
+        samples = np.array(
+            [
+                screenCfg[1][self.ys[i] - screenCfg[2][1], self.xs[i] - screenCfg[2][0]]
+                for i, screenCfg in enumerate(comparisonRois)
+            ]
+        )
+        self.hashes = self.hash(samples)
+        self.colors = samples.mean(axis=(1, 2))
+
+    @staticmethod
+    def hash(samples):
+        """Brightness gradients (n x 8 x 8) of n sampled BGR grids of 8 x 9 pixels."""
+        gray = samples.astype(np.float32) @ GRAY_WEIGHTS
+        return gray[:, :, 1:] - gray[:, :, :-1]
+
+    def distances(self, img):
+        """
+        Compare the frame with all reference screens.
+
+        Returns:
+            tuple of the number of differing gradients for each screen and a
+            boolean array telling whether the mean colour of the compare area
+            matches
+        """
+        samples = img[self.ys, self.xs]
+        distances = (
+            np.abs(self.hash(samples) - self.hashes) > self.maxGradientDiff
+        ).sum(axis=(1, 2))
+        colorMatches = (
+            np.abs(samples.mean(axis=(1, 2)) - self.colors) <= self.maxColorDiff
+        ).all(axis=1)
+        return distances, colorMatches
+
+    def recognize(self, img):
+        """Return the screen shown in img or Screen.UNKNOWN."""
+        distances, colorMatches = self.distances(img)
+        candidates = np.flatnonzero(
+            colorMatches & (distances <= self.ambiguousDistance)
+        )
+        if len(candidates) == 0:
+            return Screen.UNKNOWN
+        if len(candidates) == 1 and distances[candidates[0]] <= self.maxDistance:
+            return self.screens[candidates[0]]
+
+        # ambiguous, decide like recognizeScreen but only among the candidates
+        screen = Screen.UNKNOWN
+        bestMatchDiff = None
+        for i in candidates:
+            diff = compareScreenRoi(img, self.comparisonRois[i])
+            if diff < 0.05 and (bestMatchDiff is None or diff < bestMatchDiff):
+                bestMatchDiff = diff
+                screen = self.screens[i]
+        return screen
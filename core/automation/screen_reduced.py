@@ -0,0 +1,94 @@
+"""Check of the reduced screen recognition on live captures"""
+
+import time
+
+from core.automation.screen import (
+    REDUCED_MATCH_DIFF,
+    compareScreenRoi,
+    recognizeScreen,
+)
+
+
+class ReducedRecognitionCheck:
+    """
+    Compares the reduced screen recognition (-gs) with the full colour one.
+
+    Every interval-th frame is recognized with both the reduced and the full
+    colour reference crops. Both are timed, so the time saved per tick is
+    measured on frames of the running game instead of a reference image,
+    and the reduced diffs are kept to check REDUCED_MATCH_DIFF against them.
+    """
+
+    def __init__(self, comparisonRois, reducedRois, interval=20):
+        """
+        Args:
+            comparisonRois: full colour reference crops (see cropComparisonRois)
+            reducedRois: reduced reference crops of the same screens
+            interval: every interval-th frame is checked
+        """
+        self.comparisonRois = comparisonRois
+        self.reducedRois = reducedRois
+        self.interval = interval
+        self.frames = 0
+        self.checked = 0
+        self.mismatches = 0
+        self.fullTime = 0.0
+        self.reducedTime = 0.0
+        # largest reduced diff to the screen recognized in full colour
+        self.maxMatchingDiff = 0.0
+        # smallest reduced diff to any other screen
+        self.minOtherDiff = float("inf")
+
+    def check(self, img, likelyScreens=None):
+        """
+        Recognize every interval-th frame with both reference crops.
+
+        Args:
+            img: frame the screen has been recognized on
+            likelyScreens: see recognizeScreen
+
+        Returns:
+            (full colour screen, reduced screen) if they differ, None otherwise
+        """
+        self.frames += 1
+        if self.frames % self.interval:
+            return None
+        self.checked += 1
+
+        start = time.perf_counter()
+        reducedScreen = recognizeScreen(
+            img, self.reducedRois, True, likelyScreens=likelyScreens
+        )
+        self.reducedTime += time.perf_counter() - start
+        start = time.perf_counter()
+        fullScreen = recognizeScreen(
+            img, self.comparisonRois, True, likelyScreens=likelyScreens
+        )
+        self.fullTime += time.perf_counter() - start
+
+        for screenCfg, reducedCfg in zip(self.comparisonRois, self.reducedRois):
+            diff = float(compareScreenRoi(img, reducedCfg))
+            if screenCfg[0] == fullScreen:
+                self.maxMatchingDiff = max(self.maxMatchingDiff, diff)
+            # screens also matching in full colour (sharing the compare area) aren't other screens
+            elif compareScreenRoi(img, screenCfg) >= 0.05:
+                self.minOtherDiff = min(self.minOtherDiff, diff)
+
+        if fullScreen != reducedScreen:
+            self.mismatches += 1
+            return fullScreen, reducedScreen
+        return None
+
+    def stats(self):
+        """Checked frames, recognition time per frame in ms and the reduced diffs."""
+        return {
+            "checked": self.checked,
+            "mismatches": self.mismatches,
+            "fullMs": self.fullTime / self.checked * 1000 if self.checked else None,
+            "reducedMs": (
+                self.reducedTime / self.checked * 1000 if self.checked else None
+            ),
+            "maxMatchingDiff": self.maxMatchingDiff,
+            "minOtherDiff": self.minOtherDiff,
+            "matchDiff": REDUCED_MATCH_DIFF,
+        }
@@ -20,6 +20,17 @@ version = 0.0
 monkeyKnowledgeEnabled = False
 
 
+def getImageAreas(resolution):
+    """Image areas for the given resolution, converted from 2560x1440 if not defined"""
+    if getResolutionString(resolution) in allImageAreas:
+        return allImageAreas[getResolutionString(resolution)]
+    return json.loads(
+        convertPositionsInString(
+            json.dumps(allImageAreas["2560x1440"]), (2560, 1440), resolution
+        )
+    )
+
+
 def load_all_configs():
     """Load all configuration files"""
     global maps, gamemodes, keybinds, towers, allImageAreas, imageAreas
@@ -37,14 +48,7 @@ def load_all_configs():
     allImageAreas = json.load(open("image_areas.json"))
 
     # Load resolution-specific image areas
-    if getResolutionString() in allImageAreas:
-        imageAreas = allImageAreas[getResolutionString()]
-    else:
-        imageAreas = json.loads(
-            convertPositionsInString(
-                json.dumps(allImageAreas["2560x1440"]), (2560, 1440), pyautogui.size()
-            )
-        )
+    imageAreas = getImageAreas(pyautogui.size())
 
     # Load playthrough stats
     if exists("playthrough_stats.json"):
@@ -0,0 +1,136 @@
+"""Tracking of money and round across ingame ticks"""
+
+import time
+from collections import deque
+
+
+class IngameValueTracker:
+    """
+    Filters the money and round readings of consecutive ingame ticks.
+
+    Money only increases by income and decreases by our own spending, so
+    a reading below the last valid reading minus everything spent since
+    means one of the two readings is wrong (e. g. explosion particles
+    recognized as digits). Instead of skipping the tick the lower value is
+    used, which never exceeds the money that is actually available.
+
+    The round only ever advances by one. Larger jumps (or decreases) are
+    accepted once the next reading confirms them.
+    """
+
+    def __init__(self, income_window=10):
+        """
+        Args:
+            income_window: number of seconds the income rate is averaged over
+        """
+        self.income_window = income_window
+        self.reset()
+
+    def reset(self):
+        """Forget all readings, to be called when a new game is started."""
+        # filtered values used for decisions, -1 if unknown
+        self.money = -1
+        self.round = -1
+        # raw money reading of the current and of the previous tick
+        self.reading = -1
+        self.last_reading = -1
+        # money spent between the previous and the current tick
+        self.last_spend = 0
+        self.expected_money = -1
+        self.money_inconsistent = False
+        self.round_inconsistent = False
+
+        self._baseline = -1
+        self._spent_since_baseline = 0
+        self._tick_spend = 0
+        self._round_candidate = None
+        self._income = deque()
+        self._last_income_tick = False
+        self._first_timestamp = None
+        self._last_timestamp = None
+
+    def update(self, money, round, timestamp=None):
+        """
+        Add the readings of a new tick.
+
+        Args:
+            money: recognized money, -1 on recognition error
+            round: recognized round, -1 on recognition error
+            timestamp: time of the readings, defaults to now
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        self.last_reading = self.reading
+        self.last_spend = self._tick_spend
+        self._tick_spend = 0
+        self.reading = money
+
+        self._update_money(money, timestamp)
+        self._update_round(round)
+
+    def spend(self, cost):
+        """Register money spent during the current tick."""
+        self._tick_spend += cost
+        self._spent_since_baseline += cost
+
+    @property
+    def income_rate(self):
+        """Average income per second over the last income_window seconds."""
+        if not self._income:
+            return 0
+        elapsed = min(self.income_window, self._last_timestamp - self._first_timestamp)
+        if elapsed <= 0:
+            return 0
+        return sum(income for _, income in self._income) / elapsed
+
+    def _update_money(self, money, timestamp):
+        self.money_inconsistent = False
+        if money == -1:
+            # keep the baseline, the spending of this tick is added to it
+            self.money = -1
+            self.expected_money = -1
+            self._last_income_tick = False
+            return
+
+        if self._baseline == -1:
+            # a single reading isn't trusted, money stays unknown until the next one
+            self.expected_money = -1
+        else:
+            self.expected_money = self._baseline - self._spent_since_baseline
+        self.money = min(money, self.expected_money)
+
+        if self._baseline != -1:
+            income = money - self.expected_money
+            if income < 0:
+                self.money_inconsistent = True
+                # the previous reading might have been too high
+                if self._last_income_tick:
+                    self._income.pop()
+            elif income > 0:
+                self._income.append((timestamp, income))
+            self._last_income_tick = income > 0
+
+        if self._first_timestamp is None:
+            self._first_timestamp = timestamp
+        self._last_timestamp = timestamp
+        while self._income and self._income[0][0] <= timestamp - self.income_window:
+            self._income.popleft()
+
+        self._baseline = money
+        self._spent_since_baseline = 0
+
+    def _update_round(self, round):
+        self.round_inconsistent = False
+        if round == -1:
+            return
+
+        if (self.round != -1 and self.round <= round <= self.round + 1) or (
+            self._round_candidate is not None
+            and self._round_candidate <= round <= self._round_candidate + 1
+        ):
+            self.round = round
+            self._round_candidate = None
+        else:
+            self._round_candidate = round
+            self.round_inconsistent = self.round != -1
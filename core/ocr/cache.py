@@ -0,0 +1,65 @@
+"""Bounded cache for OCR results of pixel-identical segments"""
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+
+class OcrResultCache:
+    """
+    LRU cache mapping the content of a segment image to its OCR result.
+
+    Money and round often stay unchanged for many consecutive ticks
+    (e. g. while waiting for cash or while the game is paused). A hit
+    skips glyph extraction and inference entirely.
+    """
+
+    def __init__(self, max_size=64):
+        """
+        Args:
+            max_size: maximum number of cached results, the least recently
+                used entry is evicted when exceeded
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def key(img, resolution):
+        """
+        Build the cache key for a segment image.
+
+        Args:
+            img: segment image (may be a non-contiguous view of a screenshot)
+            resolution: resolution the segment was taken at
+
+        Returns:
+            hashable key of shape, resolution and a digest of the pixel data
+        """
+        digest = hashlib.blake2b(
+            np.ascontiguousarray(img).data, digest_size=16
+        ).digest()
+        return (img.shape, tuple(resolution), digest)
+
+    def get(self, key):
+        """Return the cached result for key or None and update the counters."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
@@ -0,0 +1,98 @@
+"""Memoization of OCR network predictions for individual glyphs"""
+
+from collections import OrderedDict
+from os.path import exists
+
+import numpy as np
+
+
+class GlyphMemo:
+    """
+    Table mapping normalized 60x60 binary glyphs to their predicted class
+    and the confidence of said prediction.
+
+    The BTD6 font renders every digit identically, so in steady state
+    nearly every glyph has been seen before and doesn't have to be
+    classified by the network again. The table can be saved to disk so
+    it is already warm on the next start.
+    """
+
+    def __init__(self, max_size=4096):
+        """
+        Args:
+            max_size: maximum number of glyphs, the least recently used
+                glyph is evicted when exceeded (e. g. explosion particles)
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def key(glyph):
+        """Pack a 0/1 glyph into 1 bit per pixel (450 bytes for 60x60)."""
+        return np.packbits(glyph).tobytes()
+
+    def get(self, key):
+        """Return the memoized (class, confidence) for key or None and update the counters."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        self.dirty = True
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self, path, modelId):
+        """
+        Load a previously saved table.
+
+        Tables saved for a different model are ignored.
+
+        Args:
+            path: .npz file written by save()
+            modelId: identifier of the currently used OCR model
+
+        Returns:
+            True if the table was loaded
+        """
+        if not exists(path):
+            return False
+        with np.load(path, allow_pickle=False) as data:
+            if str(data["model"]) != modelId or "confidences" not in data.files:
+                return False
+            for key, value, confidence in zip(
+                data["keys"], data["classes"], data["confidences"]
+            ):
+                self._entries[key.tobytes()] = (int(value), float(confidence))
+        return True
+
+    def save(self, path, modelId):
+        keys = np.array(
+            [np.frombuffer(key, dtype=np.uint8) for key in self._entries],
+            dtype=np.uint8,
+        ).reshape((len(self._entries), -1))
+        classes = np.array(
+            [entry[0] for entry in self._entries.values()], dtype=np.int16
+        )
+        confidences = np.array(
+            [entry[1] for entry in self._entries.values()], dtype=np.float32
+        )
+        np.savez_compressed(
+            path,
+            model=np.array(modelId),
+            keys=keys,
+            classes=classes,
+            confidences=confidences,
+        )
+        self.dirty = False
@@ -0,0 +1,231 @@
+"""
+Pure NumPy forward pass for the digit OCR network.
+
+The Keras model is exported once (see convert_ocr_model.py) into a .npz file
+containing the layer configuration and weights. Loading and running the
+exported network only requires NumPy, which avoids importing TensorFlow.
+"""
+
+import json
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+SUPPORTED_ACTIVATIONS = ["linear", "relu", "sigmoid", "tanh", "softmax"]
+
+
+def _activation(x, name):
+    if name == "linear":
+        return x
+    if name == "relu":
+        return np.maximum(x, 0)
+    if name == "sigmoid":
+        return 1 / (1 + np.exp(-x))
+    if name == "tanh":
+        return np.tanh(x)
+    if name == "softmax":
+        e = np.exp(x - np.max(x, axis=-1, keepdims=True))
+        return e / np.sum(e, axis=-1, keepdims=True)
+    raise ValueError(f"unsupported activation: {name}")
+
+
+def _pad_same(x, size, strides, value=0.0):
+    """Pad height and width of a NHWC tensor like Keras' 'same' padding."""
+    pads = []
+    for dim, k, s in zip(x.shape[1:3], size, strides):
+        out = -(-dim // s)
+        total = max((out - 1) * s + k - dim, 0)
+        pads.append((total // 2, total - total // 2))
+    return np.pad(x, ((0, 0), pads[0], pads[1], (0, 0)), constant_values=value)
+
+
+def _windows(x, size, strides):
+    """Return a (n, outH, outW, c, kh, kw) view of all pooling/convolution windows."""
+    view = np.lib.stride_tricks.sliding_window_view(x, size, axis=(1, 2))
+    return view[:, :: strides[0], :: strides[1]]
+
+
+def _conv2d(x, layer, weights):
+    kernel, bias = weights[0], weights[1] if len(weights) > 1 else None
+    size = kernel.shape[:2]
+    if layer["padding"] == "same":
+        x = _pad_same(x, size, layer["strides"])
+    windows = _windows(x, size, layer["strides"])
+    # (n, oh, ow, c, kh, kw) x (kh, kw, c, f) -> (n, oh, ow, f)
+    out = np.tensordot(windows, kernel, axes=([3, 4, 5], [2, 0, 1]))
+    if bias is not None:
+        out += bias
+    return _activation(out, layer["activation"])
+
+
+def _pool2d(x, layer, reduce):
+    if layer["padding"] == "same":
+        x = _pad_same(x, layer["pool_size"], layer["strides"], value=-np.inf)
+    return reduce(_windows(x, layer["pool_size"], layer["strides"]), axis=(4, 5))
+
+
+def _dense(x, layer, weights):
+    out = x @ weights[0]
+    if len(weights) > 1:
+        out += weights[1]
+    return _activation(out, layer["activation"])
+
+
+def _batch_normalization(x, layer, weights):
+    weights = list(weights)
+    gamma = weights.pop(0) if layer["scale"] else 1.0
+    beta = weights.pop(0) if layer["center"] else 0.0
+    mean, variance = weights
+    return (x - mean) / np.sqrt(variance + layer["epsilon"]) * gamma + beta
+
+
+def _layer_from_keras(layer):
+    """Translate a Keras layer into a serializable description."""
+    name = layer.__class__.__name__
+    config = layer.get_config()
+    entry = {"type": name}
+
+    if (
+        name in ["Conv2D", "Dense"]
+        and config["activation"] not in SUPPORTED_ACTIVATIONS
+    ):
+        raise ValueError(f"unsupported activation: {config['activation']}")
+
+    if name == "Conv2D":
+        if config.get("data_format", "channels_last") != "channels_last":
+            raise ValueError("only channels_last convolutions are supported")
+        if (
+            tuple(config.get("dilation_rate", (1, 1))) != (1, 1)
+            or config.get("groups", 1) != 1
+        ):
+            raise ValueError("dilated or grouped convolutions are not supported")
+        entry["strides"] = list(config["strides"])
+        entry["padding"] = config["padding"]
+        entry["activation"] = config["activation"]
+    elif name in ["MaxPooling2D", "AveragePooling2D"]:
+        if name == "AveragePooling2D" and config["padding"] != "valid":
+            raise ValueError("only 'valid' average pooling is supported")
+        entry["pool_size"] = list(config["pool_size"])
+        entry["strides"] = list(config["strides"] or config["pool_size"])
+        entry["padding"] = config["padding"]
+    elif name == "Dense":
+        entry["activation"] = config["activation"]
+    elif name == "Activation":
+        if config["activation"] not in SUPPORTED_ACTIVATIONS:
+            raise ValueError(f"unsupported activation: {config['activation']}")
+        entry["activation"] = config["activation"]
+    elif name == "ReLU":
+        if config.get("max_value") is not None or config.get("negative_slope", 0):
+            raise ValueError("only plain ReLU layers are supported")
+    elif name == "Reshape":
+        entry["target_shape"] = list(config["target_shape"])
+    elif name == "Rescaling":
+        entry["scale"] = float(config["scale"])
+        entry["offset"] = float(config["offset"])
+    elif name == "BatchNormalization":
+        entry["epsilon"] = float(config["epsilon"])
+        entry["center"] = bool(config["center"])
+        entry["scale"] = bool(config["scale"])
+    elif name not in ["InputLayer", "Flatten", "Dropout", "Softmax"]:
+        raise ValueError(f"unsupported layer type: {name}")
+
+    return entry
+
+
+def export_keras_model(model, path):
+    """
+    Export a sequential Keras model into a .npz file readable by NumpyNet.
+
+    Args:
+        model: loaded Keras model (Sequential or linear functional model)
+        path: output filename
+
+    Raises:
+        ValueError: If the model contains layers that can't be exported
+    """
+    layers = []
+    arrays = {}
+    for iLayer, layer in enumerate(model.layers):
+        entry = _layer_from_keras(layer)
+        entry["weights"] = []
+        for iWeight, weight in enumerate(layer.get_weights()):
+            key = f"layer{iLayer}_{iWeight}"
+            arrays[key] = np.asarray(weight, dtype=np.float32)
+            entry["weights"].append(key)
+        layers.append(entry)
+
+    config = {
+        "version": FORMAT_VERSION,
+        "input_shape": list(model.input_shape[1:]),
+        "layers": layers,
+    }
+    np.savez(path, config=np.array(json.dumps(config)), **arrays)
+
+
+class NumpyNet:
+    """
+    Inference only implementation of an exported Keras network.
+
+    Provides the same predict() signature as keras.Model so it can be used
+    as a drop-in replacement by ocr.py.
+    """
+
+    def __init__(self, config, weights):
+        if config.get("version") != FORMAT_VERSION:
+            raise ValueError(f"unsupported model format: {config.get('version')}")
+        self.input_shape = tuple(config["input_shape"])
+        self.layers = config["layers"]
+        self.weights = weights
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            config = json.loads(str(data["config"]))
+            weights = {key: data[key] for key in data.files if key != "config"}
+        return cls(config, weights)
+
+    def predict(self, x, verbose=0):
+        """
+        Run the forward pass.
+
+        Args:
+            x: input batch, e. g. (n, 60, 60) glyphs
+            verbose: ignored, only for compatibility with keras.Model.predict
+
+        Returns:
+            (n, classes) float32 array of network outputs
+        """
+        x = np.asarray(x, dtype=np.float32)
+        # keras accepts (n, 60, 60) for a (60, 60, 1) input
+        if x.ndim == len(self.input_shape) and self.input_shape[-1] == 1:
+            x = x[..., np.newaxis]
+
+        for layer in self.layers:
+            weights = [self.weights[key] for key in layer["weights"]]
+            kind = layer["type"]
+            if kind == "Conv2D":
+                x = _conv2d(x, layer, weights)
+            elif kind == "MaxPooling2D":
+                x = _pool2d(x, layer, np.max)
+            elif kind == "AveragePooling2D":
+                x = _pool2d(x, layer, np.mean)
+            elif kind == "Dense":
+                x = _dense(x, layer, weights)
+            elif kind == "BatchNormalization":
+                x = _batch_normalization(x, layer, weights)
+            elif kind == "Activation":
+                x = _activation(x, layer["activation"])
+            elif kind == "ReLU":
+                x = _activation(x, "relu")
+            elif kind == "Softmax":
+                x = _activation(x, "softmax")
+            elif kind == "Rescaling":
+                x = x * layer["scale"] + layer["offset"]
+            elif kind == "Reshape":
+                x = x.reshape((len(x), *layer["target_shape"]))
+            elif kind == "Flatten":
+                x = x.reshape((len(x), -1))
+            # InputLayer and Dropout are no-ops during inference
+
+        return x.astype(np.float32, copy=False)
@@ -0,0 +1,64 @@
+"""Clocks the automation waits on and takes timestamps from"""
+
+import time
+
+
+class Clock:
+    """
+    The system clock.
+
+    Input drivers provide the clock the automation runs on, so a replay of
+    a recorded session can run on a VirtualClock without touching the
+    time module.
+    """
+
+    def sleep(self, seconds: float) -> None:
+        """
+        Wait for the given time.
+
+        Args:
+            seconds: number of seconds to wait
+        """
+        time.sleep(seconds)
+
+    def monotonic(self) -> float:
+        """Seconds of a clock that never goes back, for timeouts."""
+        return time.monotonic()
+
+    def time(self) -> float:
+        """Seconds since the epoch, for timestamps."""
+        return time.time()
+
+
+class VirtualClock(Clock):
+    """
+    A clock only advanced by sleeping.
+
+    Sleeping returns immediately, so everything waiting on the clock runs
+    as fast as it is processed and sees the same times on every run.
+    """
+
+    def __init__(self, epoch: float | None = None):
+        """
+        Args:
+            epoch: value of time() when the clock starts, defaults to now
+        """
+        self.elapsed = 0.0
+        self.epoch = time.time() if epoch is None else epoch
+
+    def sleep(self, seconds: float) -> None:
+        """
+        Advance the clock.
+
+        Args:
+            seconds: number of seconds to advance the clock by
+        """
+        self.elapsed += max(0, seconds)
+
+    def monotonic(self) -> float:
+        """Seconds since the clock started."""
+        return self.elapsed
+
+    def time(self) -> float:
+        """Seconds since the epoch on the clock."""
+        return self.epoch + self.elapsed
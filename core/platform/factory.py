@@ -1,5 +1,6 @@
 """Platform factory - automatically selects the appropriate input driver"""
 
+import os
 import platform
 from typing import Optional
 from .input.base import InputDriver
@@ -16,7 +17,13 @@ def get_input_driver() -> InputDriver:
     the appropriate driver implementation:
     - Windows: WindowsInputDriver (using AHK)
     - macOS: MacOSInputDriver (using PyAutoGUI + AppleScript)
-    - Linux: LinuxInputDriver (using PyAutoGUI + xdotool)
+    - Linux: XTestInputDriver (using python-xlib) if python-xlib is
+      installed, otherwise LinuxInputDriver (using PyAutoGUI + xdotool)
+
+    If the environment variable BTD6_RECORDED_SESSION is set to a recording
+    (.npz file or directory of frames), a RecordedSessionDriver replaying it
+    is returned instead on any platform. BTD6_RECORDED_SESSION_LOG sets the
+    file input is logged to.
 
     Returns:
         Platform-specific InputDriver instance
@@ -29,7 +36,14 @@ def get_input_driver() -> InputDriver:
     if _input_driver is None:
         system = platform.system()
 
-        if system == "Windows":
+        if os.environ.get("BTD6_RECORDED_SESSION"):
+            from .input.recorded import RecordedSessionDriver
+
+            _input_driver = RecordedSessionDriver(
+                os.environ["BTD6_RECORDED_SESSION"],
+                log_path=os.environ.get("BTD6_RECORDED_SESSION_LOG"),
+            )
+        elif system == "Windows":
             from .input.windows import WindowsInputDriver
 
             _input_driver = WindowsInputDriver()
@@ -38,9 +52,17 @@ def get_input_driver() -> InputDriver:
 
             _input_driver = MacOSInputDriver()
         elif system == "Linux":
-            from .input.linux import LinuxInputDriver
+            from .input import xtest
+
+            if xtest.is_available():
+                try:
+                    _input_driver = xtest.XTestInputDriver()
+                except RuntimeError as e:
+                    print(f"Warning: XTest input unavailable ({e})")
+            if _input_driver is None:
+                from .input.linux import LinuxInputDriver
 
-            _input_driver = LinuxInputDriver()
+                _input_driver = LinuxInputDriver()
         else:
             raise RuntimeError(
                 f"Unsupported platform: {system}. "
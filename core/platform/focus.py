@@ -0,0 +1,53 @@
+"""Cached tracking of the active window"""
+
+import time
+
+from .input.base import InputDriver
+
+
+class FocusTracker:
+    """
+    Caches the title of the active window for a short time.
+
+    Depending on the platform, querying the active window starts a process
+    (xdotool, osascript) or talks to the AHK process. The title is
+    requested several times per tick (screen recognition, hotkeys, hero
+    placement, polling in waitForScreen), so it is only queried again once
+    it is older than ttl or after invalidate.
+
+    The cache is invalidated whenever input is sent, so a focus check
+    following input always queries the active window again, while the
+    checks of ticks without input cost at most one query per ttl. Drivers
+    tracking the active window by events (InputDriver.tracks_active_window)
+    are asked every time.
+    """
+
+    def __init__(self, driver: InputDriver, ttl: float = 0.5):
+        """
+        Args:
+            driver: input driver used to query the active window
+            ttl: number of seconds a queried title is reused
+        """
+        self._driver = driver
+        self.ttl = ttl
+        self._title = None
+        self._timestamp = None
+
+    def get_active_window_title(self) -> str | None:
+        """
+        Get the title of the active window, queried at most once per ttl.
+
+        Returns:
+            Window title or None if unable to determine
+        """
+        if self._driver.tracks_active_window():
+            return self._driver.get_active_window_title()
+        now = time.monotonic()
+        if self._timestamp is None or now - self._timestamp >= self.ttl:
+            self._title = self._driver.get_active_window_title()
+            self._timestamp = now
+        return self._title
+
+    def invalidate(self) -> None:
+        """Query the active window again on the next call."""
+        self._timestamp = None
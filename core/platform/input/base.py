@@ -1,7 +1,13 @@
 """Input driver base class - abstract interface for platform-specific input control"""
 
 from abc import ABC, abstractmethod
-from typing import Tuple, Optional, Any
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+import pyautogui
+
+from ..clock import Clock
 
 
 class InputDriver(ABC):
@@ -11,8 +17,14 @@ class InputDriver(ABC):
     This interface defines the contract for all input operations needed
     by the BTD6 automation system, allowing different implementations
     for Windows (AHK), macOS, and Linux.
+
+    The automation waits on and takes timestamps from the driver's clock,
+    which is the system clock unless a driver replaces it (e. g. by a
+    VirtualClock when replaying a recorded session).
     """
 
+    clock: Clock = Clock()
+
     @abstractmethod
     def send_key(self, key: str, delay: int = 15, duration: int = 30) -> None:
         """
@@ -26,17 +38,17 @@ class InputDriver(ABC):
         pass
 
     @abstractmethod
-    def click(self, pos: Tuple[int, int]) -> None:
+    def click(self, pos: tuple[int, int]) -> None:
         """
         Click the mouse at the specified position.
 
         Args:
-            pos: (x, y) coordinates to click
+            pos: (x, y) coordinates to click, None for the current position
         """
         pass
 
     @abstractmethod
-    def move_to(self, pos: Tuple[int, int]) -> None:
+    def move_to(self, pos: tuple[int, int]) -> None:
         """
         Move the mouse cursor to the specified position.
 
@@ -45,6 +57,36 @@ class InputDriver(ABC):
         """
         pass
 
+    def execute_sequence(self, steps: Sequence[tuple[str, Any]]) -> None:
+        """
+        Execute a sequence of input actions, e. g. placing a monkey.
+
+        Drivers able to send a whole sequence at once override this. The
+        default implementation executes the steps one by one. The waits
+        are part of the sequence and are always kept, they are the time
+        the game needs to register the inputs. Sending the sequence at
+        once only saves the overhead a driver has per action (e. g. one
+        xdotool process per action on Linux).
+
+        Args:
+            steps: list of (action, argument) with the actions
+                - "move": move the mouse to the (x, y) argument
+                - "click": click at the (x, y) argument, None for the current position
+                - "key": send the key argument
+                - "sleep": wait for the argument in seconds
+        """
+        for action, argument in steps:
+            if action == "move":
+                self.move_to(argument)
+            elif action == "click":
+                self.click(argument)
+            elif action == "key":
+                self.send_key(argument)
+            elif action == "sleep":
+                self.clock.sleep(argument)
+            else:
+                raise ValueError(f"unknown input action: {action}")
+
     @abstractmethod
     def is_game_focused(self) -> bool:
         """
@@ -55,8 +97,21 @@ class InputDriver(ABC):
         """
         pass
 
+    def tracks_active_window(self) -> bool:
+        """
+        Check if the active window is tracked by events.
+
+        Drivers returning True answer get_active_window_title from state
+        kept up to date by the window system, without starting a process
+        or waiting for a reply, so the title doesn't need to be cached.
+
+        Returns:
+            True if querying the active window is cheap, False otherwise
+        """
+        return False
+
     @abstractmethod
-    def get_active_window_title(self) -> Optional[str]:
+    def get_active_window_title(self) -> str | None:
         """
         Get the title of the currently active window.
 
@@ -74,3 +129,40 @@ class InputDriver(ABC):
             PIL Image object of the screenshot
         """
         ...
+
+    def grabs_regions(self) -> bool:
+        """
+        Check if screenshot_region only transfers the requested region.
+
+        If not, capturing several small regions costs as much as several
+        full screenshots and the whole screen should be grabbed once
+        instead.
+
+        Returns:
+            True if regions are grabbed natively, False otherwise
+        """
+        return False
+
+    def screenshot_region(
+        self, region: tuple[int, int, int, int], out: np.ndarray | None = None
+    ) -> np.ndarray:
+        """
+        Capture a region of the screen as BGR array.
+
+        Drivers with a faster way of grabbing parts of the screen override
+        this. The default implementation uses PyAutoGUI, whose screenshot
+        grabs the whole screen and crops it on every platform (on macOS
+        with a screencapture process per call).
+
+        Args:
+            region: (left, top, width, height) of the region
+            out: array of shape (height, width, 3) to write the pixels to
+
+        Returns:
+            out, or a new array if out is None
+        """
+        pixels = np.asarray(pyautogui.screenshot(region=region))[:, :, 2::-1]
+        if out is None:
+            return pixels.copy()
+        out[:] = pixels
+        return out
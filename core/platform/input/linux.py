@@ -1,10 +1,30 @@
 """Linux input driver using PyAutoGUI and xdotool/wmctrl"""
 
-from typing import Tuple, Optional
-import pyautogui
+import re
 import subprocess
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+import pyautogui
+
+from .. import x11, x11_shm
 from .base import InputDriver
 
+# X keysym names of the AHK key names used in keybinds.json (lowercase)
+X_KEYSYM_NAMES = {
+    "esc": "Escape",
+    "escape": "Escape",
+    "tab": "Tab",
+    "space": "space",
+    "backspace": "BackSpace",
+    "enter": "Return",
+    "pgdn": "Next",
+    "pgup": "Prior",
+    "del": "Delete",
+    "delete": "Delete",
+}
+
 
 class LinuxInputDriver(InputDriver):
     """
@@ -15,16 +35,36 @@ class LinuxInputDriver(InputDriver):
     for window management.
 
     Dependencies:
+        - python-xlib (optional, for window detection without subprocesses)
+        - libX11 and libXext (optional, for screen capture over MIT-SHM)
         - xdotool (for window detection)
         - wmctrl (alternative for window detection)
     """
 
     def __init__(self):
         """Initialize the Linux driver."""
+        self._window_watcher = None
+        if x11.is_available():
+            try:
+                self._window_watcher = x11.ActiveWindowWatcher()
+            except x11.WATCHER_ERRORS as e:
+                print(f"Warning: X11 window tracking unavailable ({e})")
+
+        self._shm_capture = None
+        if x11_shm.is_available():
+            try:
+                self._shm_capture = x11_shm.XShmCapture()
+            except RuntimeError as e:
+                print(f"Warning: MIT-SHM screen capture unavailable ({e})")
+
         self._has_xdotool = self._check_command("xdotool")
         self._has_wmctrl = self._check_command("wmctrl")
 
-        if not self._has_xdotool and not self._has_wmctrl:
+        if (
+            self._window_watcher is None
+            and not self._has_xdotool
+            and not self._has_wmctrl
+        ):
             print(
                 "Warning: xdotool or wmctrl not found. Window detection may not work."
             )
@@ -52,7 +92,7 @@ class LinuxInputDriver(InputDriver):
         # PyAutoGUI press
         pyautogui.press(key)
 
-    def click(self, pos: Tuple[int, int]) -> None:
+    def click(self, pos: tuple[int, int]) -> None:
         """
         Click the mouse at the specified position.
 
@@ -61,7 +101,7 @@ class LinuxInputDriver(InputDriver):
         """
         pyautogui.click(pos)
 
-    def move_to(self, pos: Tuple[int, int]) -> None:
+    def move_to(self, pos: tuple[int, int]) -> None:
         """
         Move mouse cursor to the specified position.
 
@@ -70,6 +110,68 @@ class LinuxInputDriver(InputDriver):
         """
         pyautogui.moveTo(pos)
 
+    def execute_sequence(self, steps: Sequence[tuple[str, Any]]) -> None:
+        """
+        Execute a sequence of input actions with a single xdotool call.
+
+        xdotool runs the whole sequence including the waits, so neither a
+        process per action nor the pause PyAutoGUI adds after every call
+        is needed. Without xdotool or if the sequence contains scancodes,
+        which xdotool can't send, the steps are executed one by one.
+
+        Args:
+            steps: see InputDriver.execute_sequence
+        """
+        if not self._has_xdotool or any(
+            action == "key" and self._is_scancode(argument)
+            for action, argument in steps
+        ):
+            super().execute_sequence(steps)
+            return
+
+        command = ["xdotool"]
+        duration = 0
+        for action, argument in steps:
+            if action == "move":
+                command += ["mousemove", str(argument[0]), str(argument[1])]
+            elif action == "click":
+                if argument is not None:
+                    command += ["mousemove", str(argument[0]), str(argument[1])]
+                command += ["click", "1"]
+            elif action == "key":
+                key = argument.strip("{}")
+                if len(key) > 1:
+                    key = X_KEYSYM_NAMES.get(key.lower(), key)
+                command += ["key", key]
+            elif action == "sleep":
+                command += ["sleep", str(argument)]
+                duration += argument
+            else:
+                raise ValueError(f"unknown input action: {action}")
+
+        try:
+            result = subprocess.run(
+                command,
+                capture_output=True,
+                text=True,
+                timeout=duration + 2,
+                check=False,
+            )
+        except subprocess.TimeoutExpired:
+            print(f"Warning: xdotool didn't finish the input sequence {steps}")
+            return
+        if result.returncode != 0:
+            print(
+                f"Warning: xdotool failed to send the input sequence {steps} ({result.stderr.strip()})"
+            )
+
+    @staticmethod
+    def _is_scancode(key) -> bool:
+        """Check if a key is given as scancode (e. g. 41 or "{sc029}")."""
+        return isinstance(key, int) or bool(
+            re.fullmatch(r"\{?sc[0-9a-f]+\}?", key, re.IGNORECASE)
+        )
+
     def is_game_focused(self) -> bool:
         """
         Check if BTD6 window is currently focused on Linux.
@@ -84,13 +186,31 @@ class LinuxInputDriver(InputDriver):
             return "BloonsTD6" in title or "BTD6" in title
         return True  # Assume focused if we can't determine
 
-    def get_active_window_title(self) -> Optional[str]:
+    def tracks_active_window(self) -> bool:
+        """
+        Check if the active window is tracked by events.
+
+        Returns:
+            True if the X11 connection of python-xlib is used
+        """
+        return self._window_watcher is not None
+
+    def get_active_window_title(self) -> str | None:
         """
         Get the title of the currently active window on Linux.
 
+        Uses the X11 connection if python-xlib is installed, otherwise
+        xdotool or wmctrl.
+
         Returns:
             Window title or None if unable to determine
         """
+        if self._window_watcher is not None:
+            try:
+                return self._window_watcher.get_active_window_title()
+            except x11.WATCHER_ERRORS:
+                pass
+
         # Try xdotool first
         if self._has_xdotool:
             try:
@@ -134,6 +254,42 @@ class LinuxInputDriver(InputDriver):
         """
         return pyautogui.screenshot()
 
+    def grabs_regions(self) -> bool:
+        """
+        Check if screenshot_region only transfers the requested region.
+
+        Returns:
+            True if the screen is captured over MIT-SHM
+        """
+        return self._shm_capture is not None
+
+    def screenshot_region(
+        self, region: tuple[int, int, int, int], out: np.ndarray | None = None
+    ) -> np.ndarray:
+        """
+        Capture a region of the screen as BGR array.
+
+        Uses MIT-SHM if available, otherwise PyAutoGUI. If MIT-SHM fails
+        (e. g. an X error), PyAutoGUI is used from then on.
+
+        Args:
+            region: (left, top, width, height) of the region
+            out: array of shape (height, width, 3) to write the pixels to
+
+        Returns:
+            out, or a new array if out is None
+        """
+        if self._shm_capture is not None:
+            try:
+                if out is None:
+                    return self._shm_capture.grab(region).copy()
+                return self._shm_capture.grab(region, out)
+            except RuntimeError as e:
+                print(f"Warning: MIT-SHM screen capture failed ({e}), using PyAutoGUI")
+                self._shm_capture.close()
+                self._shm_capture = None
+        return super().screenshot_region(region, out)
+
     @staticmethod
     def _check_command(command: str) -> bool:
         """
@@ -0,0 +1,182 @@
+"""Input driver replaying a recorded session instead of using the desktop"""
+
+import os
+import re
+
+import cv2
+import numpy as np
+
+from ..clock import VirtualClock
+from .base import InputDriver
+
+
+class RecordedSessionEnded(EOFError):
+    """Raised by captures once the end of the recording has been reached."""
+
+
+class RecordedSessionDriver(InputDriver):
+    """
+    Serves recorded frames as screenshots and logs all input.
+
+    Frames are loaded from either
+        - an .npz file with the arrays "frames" (n x height x width x 3, BGR)
+          and "timestamps" (n, seconds)
+        - a directory of .png files named by their timestamp in seconds
+          (e. g. "12.250.png"). Otherwise the files are 1 second apart in
+          the order of their names
+
+    The replay runs on a VirtualClock, which the automation waits on
+    instead of the system clock (see InputDriver.clock). Sleeping only
+    advances it and the frame shown is the last one whose timestamp
+    (relative to the first frame) is reached by it. A replay therefore sees the same frames at the same decisions no matter
+    how fast a tick is processed and takes no longer than the processing
+    itself. Input is not executed but appended to inputs and, if given, to
+    a log file, together with the time on the clock.
+
+    No desktop is required, but pyautogui still has to be importable and
+    its screen size is used as resolution elsewhere, so a virtual display
+    (e. g. Xvfb) with the resolution of the recording is needed on Linux.
+    """
+
+    def __init__(self, path: str, log_path: str | None = None):
+        """
+        Load the recording.
+
+        Args:
+            path: .npz file or directory of .png files
+            log_path: file the input calls are appended to
+
+        Raises:
+            FileNotFoundError: If path doesn't exist or contains no frames
+        """
+        self.clock = VirtualClock()
+        self.inputs: list[tuple[float, str, object]] = []
+        self._log_path = log_path
+        self._frame_index = None
+        self._frame = None
+        self._mouse_pos = (0, 0)
+
+        if path.endswith(".npz"):
+            recording = np.load(path)
+            self._frames = recording["frames"]
+            self._files = None
+            self.timestamps = np.asarray(recording["timestamps"], dtype=np.float64)
+        else:
+            files = [f for f in os.listdir(path) if f.endswith(".png")]
+            if all(re.fullmatch(r"\d+(\.\d+)?\.png", f) for f in files):
+                files.sort(key=lambda f: float(f[:-4]))
+                self.timestamps = np.array([float(f[:-4]) for f in files])
+            else:
+                files.sort()
+                self.timestamps = np.arange(len(files), dtype=np.float64)
+            self._files = [os.path.join(path, f) for f in files]
+            self._frames = None
+
+        if len(self.timestamps) == 0:
+            raise FileNotFoundError(f"no frames found in {path}")
+        self.timestamps = self.timestamps - self.timestamps[0]
+
+    def _current_frame(self) -> np.ndarray:
+        """
+        Frame at the time on the virtual clock.
+
+        Raises:
+            RecordedSessionEnded: If the end of the recording has been reached
+        """
+        elapsed = self.clock.monotonic()
+        if elapsed > self.timestamps[-1] + 1:
+            raise RecordedSessionEnded("end of the recorded session")
+        index = int(np.searchsorted(self.timestamps, elapsed, side="right")) - 1
+        if index != self._frame_index:
+            self._frame_index = index
+            if self._frames is not None:
+                self._frame = self._frames[index]
+            else:
+                self._frame = cv2.imread(self._files[index])
+        return self._frame
+
+    def _log(self, action: str, value) -> None:
+        elapsed = self.clock.monotonic()
+        self.inputs.append((elapsed, action, value))
+        if self._log_path:
+            with open(self._log_path, "a") as f:
+                f.write(f"{elapsed:.3f} {action} {value}\n")
+
+    def send_key(self, key: str, delay: int = 15, duration: int = 30) -> None:
+        """
+        Log a key press.
+
+        Args:
+            key: Key to send
+            delay: ignored
+            duration: ignored
+        """
+        self._log("key", key)
+
+    def click(self, pos: tuple[int, int] | None) -> None:
+        """
+        Log a click.
+
+        Args:
+            pos: (x, y) coordinates to click, None for the current position
+        """
+        if pos is not None:
+            self._mouse_pos = tuple(pos)
+        self._log("click", self._mouse_pos)
+
+    def move_to(self, pos: tuple[int, int]) -> None:
+        """
+        Log a mouse movement.
+
+        Args:
+            pos: (x, y) coordinates to move to
+        """
+        self._mouse_pos = tuple(pos)
+        self._log("move", self._mouse_pos)
+
+    def is_game_focused(self) -> bool:
+        """The recorded game is always focused."""
+        return True
+
+    def tracks_active_window(self) -> bool:
+        """The active window never changes."""
+        return True
+
+    def get_active_window_title(self) -> str | None:
+        """The recorded game is always the active window."""
+        return "BloonsTD6"
+
+    def screenshot(self):
+        """
+        Current frame of the recording.
+
+        Returns:
+            PIL Image object
+        """
+        from PIL import Image
+
+        return Image.fromarray(self._current_frame()[:, :, ::-1])
+
+    def grabs_regions(self) -> bool:
+        """Regions are cut out of the recorded frame."""
+        return True
+
+    def screenshot_region(
+        self, region: tuple[int, int, int, int], out: np.ndarray | None = None
+    ) -> np.ndarray:
+        """
+        Region of the current frame of the recording as BGR array.
+
+        Args:
+            region: (left, top, width, height) of the region
+            out: array of shape (height, width, 3) to write the pixels to
+
+        Returns:
+            out, or a new array if out is None
+        """
+        left, top, width, height = region
+        pixels = self._current_frame()[top : top + height, left : left + width]
+        if out is None:
+            return pixels.copy()
+        out[:] = pixels
+        return out
@@ -0,0 +1,207 @@
+"""Linux input driver using the XTest extension over a persistent X11 connection"""
+
+import numpy as np
+
+from .. import x11, x11_shm
+from .base import InputDriver
+from .linux import X_KEYSYM_NAMES
+
+try:
+    from Xlib import XK, X
+    from Xlib import display as xdisplay
+    from Xlib.ext import xtest
+except ImportError:
+    xdisplay = None
+
+# X keycodes of evdev based servers (Xorg, Xvfb) are the scancodes plus 8
+SCANCODE_KEYCODE_OFFSET = 8
+
+
+def is_available() -> bool:
+    """Check if python-xlib is installed and an X display is set."""
+    return xdisplay is not None and x11.is_available()
+
+
+class XTestInputDriver(InputDriver):
+    """
+    Linux input driver sending input with XTest.
+
+    Keys and mouse events are injected as fake input over one persistent
+    connection to the X server, the active window is tracked with EWMH
+    properties by x11.ActiveWindowWatcher and the screen is captured over
+    MIT-SHM if available. No processes are started and each input takes a
+    single round trip, so it also works under Xvfb.
+
+    Integer keys are scancodes as used by AHK (e. g. 51 for ","). They are
+    converted to keycodes by adding 8, which is correct for the main block
+    of the keyboard on servers using evdev keycodes.
+
+    Dependencies:
+        - python-xlib
+        - libX11 and libXext (optional, for screen capture over MIT-SHM)
+    """
+
+    def __init__(self):
+        """
+        Open the display connection.
+
+        Raises:
+            RuntimeError: If python-xlib, the X display or XTest are unavailable
+        """
+        if not is_available():
+            raise RuntimeError("python-xlib or X display not available")
+        self._display = x11.open_display()
+        if not self._display.query_extension("XTEST"):
+            self._display.close()
+            raise RuntimeError("X server doesn't support XTEST")
+        try:
+            self._window_watcher = x11.ActiveWindowWatcher()
+        except RuntimeError:
+            self._display.close()
+            raise
+
+        self._shm_capture = None
+        if x11_shm.is_available():
+            try:
+                self._shm_capture = x11_shm.XShmCapture()
+            except RuntimeError as e:
+                print(f"Warning: MIT-SHM screen capture unavailable ({e})")
+
+    def _get_keycode(self, key) -> int:
+        """
+        Convert a key to an X keycode.
+
+        Args:
+            key: scancode or AHK-style key name (e. g. "q" or "{Esc}")
+
+        Raises:
+            ValueError: If the key has no keycode
+        """
+        if isinstance(key, int):
+            return key + SCANCODE_KEYCODE_OFFSET
+        name = key.strip("{}")
+        if len(name) > 1:
+            keysym = XK.string_to_keysym(X_KEYSYM_NAMES.get(name.lower(), name))
+        else:
+            # keysyms of latin-1 characters equal their code points
+            keysym = ord(name)
+        keycode = self._display.keysym_to_keycode(keysym) if keysym else 0
+        if not keycode:
+            raise ValueError(f"no keycode for key {key}")
+        return keycode
+
+    def send_key(self, key: str, delay: int = 15, duration: int = 30) -> None:
+        """
+        Send a keyboard key with XTest.
+
+        Args:
+            key: Key to send (string key name or int scancode)
+            delay: Delay after releasing the key in milliseconds
+            duration: Duration to hold the key in milliseconds
+        """
+        keycode = self._get_keycode(key)
+        xtest.fake_input(self._display, X.KeyPress, keycode)
+        self._display.sync()
+        self.clock.sleep(duration / 1000)
+        xtest.fake_input(self._display, X.KeyRelease, keycode)
+        self._display.sync()
+        self.clock.sleep(delay / 1000)
+
+    def click(self, pos: tuple[int, int] | None) -> None:
+        """
+        Click the left mouse button.
+
+        Args:
+            pos: (x, y) coordinates to click, None for the current position
+        """
+        if pos is not None:
+            xtest.fake_input(self._display, X.MotionNotify, x=pos[0], y=pos[1])
+        xtest.fake_input(self._display, X.ButtonPress, 1)
+        xtest.fake_input(self._display, X.ButtonRelease, 1)
+        self._display.sync()
+
+    def move_to(self, pos: tuple[int, int]) -> None:
+        """
+        Move mouse cursor to the specified position.
+
+        Args:
+            pos: (x, y) coordinates to move to
+        """
+        xtest.fake_input(self._display, X.MotionNotify, x=pos[0], y=pos[1])
+        self._display.sync()
+
+    def is_game_focused(self) -> bool:
+        """
+        Check if BTD6 window is currently focused.
+
+        Returns:
+            True if BTD6 is focused, False otherwise
+        """
+        title = self.get_active_window_title()
+        if title:
+            return "BloonsTD6" in title or "BTD6" in title
+        return True  # Assume focused if we can't determine
+
+    def tracks_active_window(self) -> bool:
+        """The active window is tracked by x11.ActiveWindowWatcher."""
+        return True
+
+    def get_active_window_title(self) -> str | None:
+        """
+        Get the title of the currently active window.
+
+        Returns:
+            Window title or None if no window is active
+        """
+        return self._window_watcher.get_active_window_title()
+
+    def screenshot(self):
+        """
+        Capture a screenshot of the current screen.
+
+        Returns:
+            PIL Image object
+        """
+        if self._shm_capture is None:
+            import pyautogui
+
+            return pyautogui.screenshot()
+        from PIL import Image
+
+        return Image.fromarray(self._shm_capture.grab()[:, :, ::-1])
+
+    def grabs_regions(self) -> bool:
+        """
+        Check if screenshot_region only transfers the requested region.
+
+        Returns:
+            True if the screen is captured over MIT-SHM
+        """
+        return self._shm_capture is not None
+
+    def screenshot_region(
+        self, region: tuple[int, int, int, int], out: np.ndarray | None = None
+    ) -> np.ndarray:
+        """
+        Capture a region of the screen as BGR array.
+
+        Uses MIT-SHM if available, otherwise PyAutoGUI. If MIT-SHM fails
+        (e. g. an X error), PyAutoGUI is used from then on.
+
+        Args:
+            region: (left, top, width, height) of the region
+            out: array of shape (height, width, 3) to write the pixels to
+
+        Returns:
+            out, or a new array if out is None
+        """
+        if self._shm_capture is not None:
+            try:
+                if out is None:
+                    return self._shm_capture.grab(region).copy()
+                return self._shm_capture.grab(region, out)
+            except RuntimeError as e:
+                print(f"Warning: MIT-SHM screen capture failed ({e}), using PyAutoGUI")
+                self._shm_capture.close()
+                self._shm_capture = None
+        return super().screenshot_region(region, out)
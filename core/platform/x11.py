@@ -0,0 +1,125 @@
+"""Active window tracking over a persistent X11 connection (requires python-xlib)"""
+
+import os
+
+try:
+    from Xlib import X, Xatom
+    from Xlib import display as xdisplay
+    from Xlib.error import CatchError, ConnectionClosedError, DisplayError, XError
+except ImportError:
+    xdisplay = None
+
+# errors opening or using an ActiveWindowWatcher (e. g. the X server went away)
+if xdisplay is None:
+    WATCHER_ERRORS = (RuntimeError, OSError)
+else:
+    WATCHER_ERRORS = (RuntimeError, OSError, XError, ConnectionClosedError)
+
+
+def is_available() -> bool:
+    """Check if python-xlib is installed and an X display is set."""
+    return xdisplay is not None and bool(os.environ.get("DISPLAY"))
+
+
+def open_display():
+    """
+    Open a python-xlib connection to $DISPLAY.
+
+    Raises:
+        RuntimeError: If python-xlib is missing or the display can't be
+            reached (e. g. $DISPLAY is set, but the server is gone or
+            refuses the connection)
+    """
+    if not is_available():
+        raise RuntimeError("python-xlib or X display not available")
+    try:
+        return xdisplay.Display()
+    except DisplayError as e:
+        raise RuntimeError(f"cannot open X display ({e})") from e
+
+
+class ActiveWindowWatcher:
+    """
+    Title of the active X11 window, updated by property change events.
+
+    The root window's _NET_ACTIVE_WINDOW property and the title of the
+    active window are watched for PropertyNotify events. Pending events are
+    drained without blocking on every call, the window title is only
+    queried again after one of them changed, so no process is started and
+    usually no round trip to the X server is needed.
+    """
+
+    def __init__(self):
+        """
+        Open the display connection.
+
+        Raises:
+            RuntimeError: If python-xlib is missing or no display is available
+        """
+        self._display = open_display()
+        self._root = self._display.screen().root
+        self._net_active_window = self._display.intern_atom("_NET_ACTIVE_WINDOW")
+        self._net_wm_name = self._display.intern_atom("_NET_WM_NAME")
+        self._utf8_string = self._display.intern_atom("UTF8_STRING")
+        self._root.change_attributes(event_mask=X.PropertyChangeMask)
+        self._window = None
+        self._title = None
+        self._dirty = True
+
+    def get_active_window_title(self) -> str | None:
+        """
+        Get the title of the currently active window.
+
+        Returns:
+            Window title or None if no window is active
+        """
+        while self._display.pending_events():
+            event = self._display.next_event()
+            if event.type == X.PropertyNotify and event.atom in (
+                self._net_active_window,
+                self._net_wm_name,
+                Xatom.WM_NAME,
+            ):
+                self._dirty = True
+        if self._dirty:
+            self._dirty = False
+            self._update()
+        return self._title
+
+    def close(self) -> None:
+        """Close the display connection."""
+        self._display.close()
+
+    def _update(self) -> None:
+        window = self._get_active_window()
+        if window != self._window:
+            if self._window is not None:
+                self._select_property_events(self._window, 0)
+            if window is not None:
+                self._select_property_events(window, X.PropertyChangeMask)
+            self._window = window
+        self._title = self._get_title(window) if window is not None else None
+
+    def _get_active_window(self):
+        prop = self._root.get_full_property(self._net_active_window, X.AnyPropertyType)
+        if not prop or not prop.value or not prop.value[0]:
+            return None
+        return self._display.create_resource_object("window", prop.value[0])
+
+    def _select_property_events(self, window, mask) -> None:
+        # errors (the window has been destroyed already) are ignored
+        window.change_attributes(event_mask=mask, onerror=CatchError())
+
+    def _get_title(self, window) -> str | None:
+        try:
+            prop = window.get_full_property(self._net_wm_name, self._utf8_string)
+            if not prop or not prop.value:
+                prop = window.get_full_property(Xatom.WM_NAME, X.AnyPropertyType)
+        except XError:
+            return None
+        if not prop or not prop.value:
+            return None
+        value = prop.value
+        if isinstance(value, bytes):
+            value = value.decode("utf-8", "replace")
+        return value
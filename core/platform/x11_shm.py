@@ -0,0 +1,324 @@
+"""Screen capture over the X11 MIT-SHM extension (libX11 and libXext via ctypes)"""
+
+import ctypes
+import ctypes.util
+import os
+from contextlib import contextmanager
+
+import numpy as np
+
+Z_PIXMAP = 2
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+
+
+class XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong),
+        ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p),
+        ("readOnly", ctypes.c_int),
+    ]
+
+
+class XImage(ctypes.Structure):
+    # only the leading fields are accessed, the function table follows
+    _fields_ = [
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+        ("red_mask", ctypes.c_ulong),
+        ("green_mask", ctypes.c_ulong),
+        ("blue_mask", ctypes.c_ulong),
+    ]
+
+
+class XErrorEvent(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("resourceid", ctypes.c_ulong),
+        ("serial", ctypes.c_ulong),
+        ("error_code", ctypes.c_ubyte),
+        ("request_code", ctypes.c_ubyte),
+        ("minor_code", ctypes.c_ubyte),
+    ]
+
+
+XErrorHandler = ctypes.CFUNCTYPE(
+    ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(XErrorEvent)
+)
+
+
+def _load_libraries():
+    names = [ctypes.util.find_library(name) for name in ["X11", "Xext", "c"]]
+    if not all(names):
+        return None
+    x11, xext, libc = (ctypes.CDLL(name) for name in names)
+
+    x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    x11.XOpenDisplay.restype = ctypes.c_void_p
+    x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+    x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+    x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+    x11.XDefaultRootWindow.restype = ctypes.c_ulong
+    x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDefaultVisual.restype = ctypes.c_void_p
+    x11.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDestroyImage.argtypes = [ctypes.POINTER(XImage)]
+    x11.XAllPlanes.restype = ctypes.c_ulong
+    x11.XSetErrorHandler.argtypes = [XErrorHandler]
+    x11.XSetErrorHandler.restype = ctypes.c_void_p
+
+    xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+    xext.XShmCreateImage.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_void_p,
+        ctypes.c_uint,
+        ctypes.c_int,
+        ctypes.c_char_p,
+        ctypes.POINTER(XShmSegmentInfo),
+        ctypes.c_uint,
+        ctypes.c_uint,
+    ]
+    xext.XShmCreateImage.restype = ctypes.POINTER(XImage)
+    xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+    xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+    xext.XShmGetImage.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_ulong,
+        ctypes.POINTER(XImage),
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_ulong,
+    ]
+
+    libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+    libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+    libc.shmat.restype = ctypes.c_void_p
+    libc.shmdt.argtypes = [ctypes.c_void_p]
+    libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+    return x11, xext, libc
+
+
+_libraries = None
+
+
+def _get_libraries():
+    global _libraries
+    if _libraries is None:
+        try:
+            _libraries = _load_libraries() or False
+        except OSError:
+            _libraries = False
+    return _libraries
+
+
+# error codes reported to the handler installed by _trap_errors
+_trapped_errors = []
+
+
+@XErrorHandler
+def _trap_error(display, event):
+    _trapped_errors.append(event.contents.error_code)
+    return 0
+
+
+@contextmanager
+def _trap_errors(display, sync=False):
+    """
+    Collect X errors instead of letting the default handler exit the process.
+
+    Errors of requests without reply (e. g. XShmAttach) arrive
+    asynchronously, so they are only caught if sync waits for the server
+    to process the requests before the handler is restored.
+
+    Raises:
+        RuntimeError: If the X server reported an error
+    """
+    x11, _, _ = _libraries
+    _trapped_errors.clear()
+    previous = x11.XSetErrorHandler(_trap_error)
+    try:
+        yield
+        if sync:
+            x11.XSync(display, 0)
+    finally:
+        x11.XSetErrorHandler(ctypes.cast(previous, XErrorHandler))
+    if _trapped_errors:
+        raise RuntimeError(f"X error {_trapped_errors[0]}")
+
+
+def is_available() -> bool:
+    """Check if libX11, libXext and an X display are available."""
+    return bool(os.environ.get("DISPLAY")) and bool(_get_libraries())
+
+
+class _ShmImage:
+    """XImage of a fixed size backed by a shared memory segment."""
+
+    def __init__(self, display, visual, depth, width, height):
+        x11, xext, libc = _libraries
+        self._display = display
+        self.info = XShmSegmentInfo()
+        self.image = xext.XShmCreateImage(
+            display,
+            visual,
+            depth,
+            Z_PIXMAP,
+            None,
+            ctypes.byref(self.info),
+            width,
+            height,
+        )
+        if not self.image:
+            raise RuntimeError("XShmCreateImage failed")
+        image = self.image.contents
+        if image.bits_per_pixel != 32 or image.byte_order != 0:
+            x11.XDestroyImage(self.image)
+            raise RuntimeError(
+                f"unsupported pixel format ({image.bits_per_pixel} bpp, byte order {image.byte_order})"
+            )
+
+        size = image.bytes_per_line * height
+        self.info.shmid = libc.shmget(IPC_PRIVATE, size, IPC_CREAT | 0o600)
+        if self.info.shmid < 0:
+            x11.XDestroyImage(self.image)
+            raise RuntimeError("shmget failed")
+        self.info.shmaddr = libc.shmat(self.info.shmid, None, 0)
+        # the segment is removed as soon as both sides detached
+        libc.shmctl(self.info.shmid, IPC_RMID, None)
+        if self.info.shmaddr in (None, ctypes.c_void_p(-1).value):
+            x11.XDestroyImage(self.image)
+            raise RuntimeError("shmat failed")
+        image.data = self.info.shmaddr
+        self.info.readOnly = 0
+        # fails asynchronously if the X server can't access the segment,
+        # e. g. when it runs in another IPC namespace (container)
+        try:
+            with _trap_errors(display, sync=True):
+                if not xext.XShmAttach(display, ctypes.byref(self.info)):
+                    raise RuntimeError("no reply")
+        except RuntimeError as e:
+            x11.XDestroyImage(self.image)
+            libc.shmdt(self.info.shmaddr)
+            raise RuntimeError(f"XShmAttach failed ({e})") from e
+
+        # BGRX pixels (little endian), the padding of each line is cut off
+        pixels = np.ctypeslib.as_array(
+            ctypes.cast(self.info.shmaddr, ctypes.POINTER(ctypes.c_uint8)),
+            shape=(height, image.bytes_per_line),
+        )
+        self.bgr = pixels[:, : width * 4].reshape(height, width, 4)[:, :, :3]
+
+    def close(self):
+        x11, xext, libc = _libraries
+        xext.XShmDetach(self._display, ctypes.byref(self.info))
+        x11.XSync(self._display, 0)
+        x11.XDestroyImage(self.image)
+        libc.shmdt(self.info.shmaddr)
+
+
+class XShmCapture:
+    """
+    Captures the screen into shared memory with the X server.
+
+    The X server writes the pixels directly into a shared memory segment,
+    which is exposed as NumPy view in BGR order. A segment is created once
+    for every region size that is captured and reused afterwards, so
+    capturing neither allocates nor flips channels.
+    """
+
+    def __init__(self, display_name: str | None = None):
+        """
+        Open the display connection.
+
+        Args:
+            display_name: X display to capture (e. g. ":99" for Xvfb), defaults to $DISPLAY
+
+        Raises:
+            RuntimeError: If the libraries, the display or MIT-SHM are
+                unavailable or the X server can't attach a segment
+        """
+        if not _get_libraries():
+            raise RuntimeError("libX11 or libXext not available")
+        x11, xext, _ = _libraries
+        self._display = x11.XOpenDisplay(
+            display_name.encode() if display_name else None
+        )
+        if not self._display:
+            raise RuntimeError("cannot open X display")
+        if not xext.XShmQueryExtension(self._display):
+            x11.XCloseDisplay(self._display)
+            raise RuntimeError("X server doesn't support MIT-SHM")
+        screen = x11.XDefaultScreen(self._display)
+        self._root = x11.XDefaultRootWindow(self._display)
+        self._visual = x11.XDefaultVisual(self._display, screen)
+        self._depth = x11.XDefaultDepth(self._display, screen)
+        self.size = (
+            x11.XDisplayWidth(self._display, screen),
+            x11.XDisplayHeight(self._display, screen),
+        )
+        self._images = {}
+        # X errors of MIT-SHM only show up once a segment is attached
+        try:
+            self.grab((0, 0, 1, 1))
+        except RuntimeError:
+            self.close()
+            raise
+
+    def grab(
+        self,
+        region: tuple[int, int, int, int] | None = None,
+        out: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """
+        Capture a region of the screen.
+
+        Args:
+            region: (left, top, width, height), defaults to the whole screen
+            out: array of shape (height, width, 3) the BGR pixels are copied to
+
+        Returns:
+            out, or a view of the shared memory (valid until the next grab
+            of a region of the same size) if out is None
+        """
+        x11, xext, _ = _libraries
+        left, top, width, height = region or (0, 0, self.size[0], self.size[1])
+        if (width, height) not in self._images:
+            self._images[(width, height)] = _ShmImage(
+                self._display, self._visual, self._depth, width, height
+            )
+        shm_image = self._images[(width, height)]
+        # XShmGetImage waits for the reply, so its errors arrive before it returns
+        with _trap_errors(self._display):
+            grabbed = xext.XShmGetImage(
+                self._display, self._root, shm_image.image, left, top, x11.XAllPlanes()
+            )
+        if not grabbed:
+            raise RuntimeError("XShmGetImage failed")
+        if out is None:
+            return shm_image.bgr
+        np.copyto(out, shm_image.bgr)
+        return out
+
+    def close(self) -> None:
+        """Release the shared memory segments and close the display connection."""
+        x11, _, _ = _libraries
+        for shm_image in self._images.values():
+            shm_image.close()
+        self._images = {}
+        x11.XCloseDisplay(self._display)
@@ -1,94 +1,273 @@
 import os
+import atexit
+import hashlib
+from os.path import exists
 import numpy as np
 import cv2
 import pyautogui
+from core.ocr.numpy_net import NumpyNet
+from core.ocr.cache import OcrResultCache
+from core.ocr.glyph_memo import GlyphMemo
+from utils.position import getResolutionString
 
-os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
-import keras
+OCR_MODEL_KERAS = "btd6_ocr_net.h5"
+OCR_MODEL_NUMPY = "btd6_ocr_net.npz"
+GLYPH_MEMO_DIR = "ocr_glyphs"
+# resolution the OCR functions default to, the screen size when the module is loaded
+SCREEN_RESOLUTION = pyautogui.size()
 
-ocr_model = keras.models.load_model("btd6_ocr_net.h5")
 
+OCR_BACKENDS = ["numpy", "keras"]
 
-def custom_ocr(img, resolution=pyautogui.size()):
-    h = img.shape[0]
-    w = img.shape[1]
 
-    white = np.array([255, 255, 255])
-    black = np.array([0, 0, 0])
+def load_ocr_backend(backend):
+    """
+    Load the digit classifier with the given backend.
 
-    for y in range(0, h):
-        for x in range(0, w):
-            if not (img[y][x] == white).all():
-                img[y][x] = black
+    Args:
+        backend: "numpy" for the exported network or "keras" for the original
+            model (requires TensorFlow)
+    """
+    if backend == "numpy":
+        return NumpyNet.load(OCR_MODEL_NUMPY)
+    if backend == "keras":
+        os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
+        import keras
 
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    thresh = cv2.threshold(gray, 60, 255, cv2.THRESH_BINARY)[1]
-    cnts, _ = cv2.findContours(
-        thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+        return keras.models.load_model(OCR_MODEL_KERAS)
+    raise ValueError("unknown OCR backend: " + str(backend))
+
+
+def load_ocr_model():
+    """
+    Load the digit classifier.
+
+    Uses the exported NumPy network if available and falls back to Keras
+    (which requires TensorFlow) otherwise.
+    """
+    if exists(OCR_MODEL_NUMPY):
+        return load_ocr_backend("numpy")
+
+    print(
+        OCR_MODEL_NUMPY
+        + " not found, falling back to keras! run convert_ocr_model.py to export the model"
     )
+    return load_ocr_backend("keras")
 
-    chrImages = []
-    chrImagesMinX = {}
-    chrs = {}
-
-    for c in cnts:
-        minX = c[0][0][0]
-        minY = c[0][0][1]
-        maxX = c[0][0][0]
-        maxY = c[0][0][1]
-        for point in c:
-            if point[0][0] < minX:
-                minX = point[0][0]
-            if point[0][0] > maxX:
-                maxX = point[0][0]
-            if point[0][1] < minY:
-                minY = point[0][1]
-            if point[0][1] > maxY:
-                maxY = point[0][1]
-        # images.append()
-        chrImg = img[minY:maxY, minX:maxX]
-
-        if (
-            chrImg.shape[0] >= 25 * resolution[0] / 2560
-            and chrImg.shape[0] <= 60 * resolution[0] / 2560
-            and chrImg.shape[1] >= 14 * resolution[1] / 1440
-            and chrImg.shape[1] <= 40 * resolution[1] / 1440
-        ):
-            chrImg = cv2.resize(chrImg, (50, 50))
-            chrImg = cv2.copyMakeBorder(
-                chrImg, 5, 5, 5, 5, cv2.BORDER_CONSTANT, value=(0, 0, 0)
-            )
-            chrImg = chrImg[:, :, 0]
 
-            for y in range(0, 60):
-                for x in range(0, 60):
-                    chrImg[y][x] = int(chrImg[y][x] / 255)
+# loaded on first use, see get_ocr_model()
+ocr_model = None
+
+ocr_model_id = None
+
+# results of recently recognized segments, bounded to keep memory constant
+ocr_cache = OcrResultCache(max_size=64)
+
+# resolution string -> GlyphMemo, loaded on first use
+glyph_memos = {}
+
+
+def get_ocr_model():
+    global ocr_model
+    if ocr_model is None:
+        ocr_model = load_ocr_model()
+    return ocr_model
+
+
+def get_ocr_model_id():
+    """Digest of the model file in use, saved glyph memos are only valid for it."""
+    global ocr_model_id
+    if ocr_model_id is None:
+        modelFile = OCR_MODEL_NUMPY if exists(OCR_MODEL_NUMPY) else OCR_MODEL_KERAS
+        with open(modelFile, "rb") as fp:
+            ocr_model_id = hashlib.blake2b(fp.read(), digest_size=16).hexdigest()
+    return ocr_model_id
+
+
+def get_glyph_memo(resolution):
+    resolutionString = getResolutionString(resolution)
+    if resolutionString not in glyph_memos:
+        memo = GlyphMemo()
+        memo.load(GLYPH_MEMO_DIR + "/" + resolutionString + ".npz", get_ocr_model_id())
+        glyph_memos[resolutionString] = memo
+    return glyph_memos[resolutionString]
+
+
+def save_glyph_memos():
+    for resolutionString, memo in glyph_memos.items():
+        if not memo.dirty:
+            continue
+        if not exists(GLYPH_MEMO_DIR):
+            os.mkdir(GLYPH_MEMO_DIR)
+        memo.save(GLYPH_MEMO_DIR + "/" + resolutionString + ".npz", get_ocr_model_id())
+
+
+atexit.register(save_glyph_memos)
+
+
+def warmup():
+    """
+    Load the model and run a single prediction.
+
+    Should be called once it is known that OCR is going to be used so
+    the first ingame tick isn't slowed down by loading the model or
+    Keras tracing the prediction graph.
+    """
+    get_ocr_model().predict(np.zeros((1, 60, 60), dtype=np.uint8), verbose=0)
+    get_glyph_memo(pyautogui.size())
+
+
+def preprocess_segment(img):
+    """
+    Black out every pixel that isn't pure white and return the binary threshold image.
+
+    The input image is modified in place (as seen by ocr_image.py).
+    """
+    white = (img == 255).all(axis=2)
+    img[~white] = 0
+
+    # after masking each pixel is either (0, 0, 0) or (255, 255, 255)
+    # which is exactly what cvtColor + threshold(60) would produce
+    return white.astype(np.uint8) * 255
+
+
+def normalize_glyph(thresh, minX, minY, maxX, maxY):
+    """Scale a character to 50x50, pad it to 60x60 and convert it to 0/1 values."""
+    chrImg = cv2.resize(thresh[minY:maxY, minX:maxX], (50, 50))
+    chrImg = cv2.copyMakeBorder(chrImg, 5, 5, 5, 5, cv2.BORDER_CONSTANT, value=0)
+    return (chrImg == 255).astype(np.uint8)
+
 
-            chrImages.append([minX, chrImg])
+def extract_glyphs(img, resolution=SCREEN_RESOLUTION):
+    """Cut the characters out of a segment and return them as normalized 60x60 glyphs."""
+    thresh = preprocess_segment(img)
+    cnts, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    if len(cnts) == 0:
+        return []
+
+    # x, y, w, h of each contour. boundingRect includes the last row/column
+    # which the character crops have always excluded
+    boxes = np.array([cv2.boundingRect(c) for c in cnts])
+    minX = boxes[:, 0]
+    minY = boxes[:, 1]
+    w = boxes[:, 2] - 1
+    h = boxes[:, 3] - 1
+
+    isCharacter = (
+        (h >= 25 * resolution[0] / 2560)
+        & (h <= 60 * resolution[0] / 2560)
+        & (w >= 14 * resolution[1] / 1440)
+        & (w <= 40 * resolution[1] / 1440)
+    )
+    indices = np.flatnonzero(isCharacter)
+    indices = indices[np.argsort(minX[indices], kind="stable")]
 
-    chrImages.sort(key=lambda item: item[0])
     # ignore entries after gap(e. g. explosion particles)
-    filteredChrImages = []
-    currentX = 0
-    for entry in chrImages:
-        if currentX + 50 >= entry[0]:
-            currentX = entry[0]
-            filteredChrImages.append(entry)
-    # minXs = list(map(lambda item: item[0], chrImages))
-    if len(filteredChrImages) == 0:
-        return "-1"
-    chrImages = list(map(lambda item: item[1], filteredChrImages))
-    chrImages = np.array(chrImages)
-
-    predictions = ocr_model.predict(chrImages, verbose=0)
+    # as the characters are sorted everything after the first gap is dropped
+    gaps = np.diff(minX[indices], prepend=0) > 50
+    if gaps.any():
+        indices = indices[: np.argmax(gaps)]
 
+    return [
+        normalize_glyph(thresh, minX[i], minY[i], minX[i] + w[i], minY[i] + h[i])
+        for i in indices
+    ]
+
+
+def classes_to_text(classes):
     number = ""
 
-    for prediction in predictions:
-        value = np.argmax(prediction)
+    for value in classes:
         if value == 10:
             number += "/"
         else:
             number += str(value)
 
     return number
+
+
+def classify_glyphs(glyphs, resolution=SCREEN_RESOLUTION):
+    """
+    Classify glyphs, only glyphs missing from the glyph memo are passed to the model.
+
+    Returns:
+        tuple of a list with the class of each glyph and a list with the
+        softmax probability of said class
+    """
+    memo = get_glyph_memo(resolution)
+    keys = [memo.key(glyph) for glyph in glyphs]
+    memoized = [memo.get(key) for key in keys]
+    classes = [entry[0] if entry else None for entry in memoized]
+    confidences = [entry[1] if entry else None for entry in memoized]
+    unknown = [i for i in range(len(glyphs)) if classes[i] is None]
+
+    if len(unknown):
+        predictions = get_ocr_model().predict(
+            np.array([glyphs[i] for i in unknown]), verbose=0
+        )
+        for i, prediction in zip(unknown, predictions):
+            classes[i] = int(np.argmax(prediction))
+            confidences[i] = float(prediction[classes[i]])
+            memo.put(keys[i], (classes[i], confidences[i]))
+
+    return classes, confidences
+
+
+def custom_ocr_batch_with_confidence(images, resolution=SCREEN_RESOLUTION):
+    """
+    Recognize several segments (e. g. money and round) with a single predict call.
+
+    Args:
+        images: dict of segment name -> segment image
+        resolution: screen resolution the segments were taken at
+
+    Returns:
+        dict of segment name -> (recognized text, list of per character confidences)
+        the text is "-1" and the list empty if no characters were found
+
+    Segments that are pixel-identical to a recently recognized segment are
+    answered from ocr_cache (and therefore not masked in place).
+    """
+    results = {}
+    cacheKeys = {}
+    glyphsBySegment = {}
+    for name, img in images.items():
+        cacheKeys[name] = ocr_cache.key(img, resolution)
+        cached = ocr_cache.get(cacheKeys[name])
+        if cached is not None:
+            results[name] = cached
+        else:
+            glyphsBySegment[name] = extract_glyphs(img, resolution)
+    allGlyphs = [glyph for glyphs in glyphsBySegment.values() for glyph in glyphs]
+    classes, confidences = classify_glyphs(allGlyphs, resolution)
+
+    offset = 0
+    for name, glyphs in glyphsBySegment.items():
+        if len(glyphs) == 0:
+            results[name] = ("-1", [])
+        else:
+            results[name] = (
+                classes_to_text(classes[offset : offset + len(glyphs)]),
+                confidences[offset : offset + len(glyphs)],
+            )
+            offset += len(glyphs)
+        ocr_cache.put(cacheKeys[name], results[name])
+
+    return {name: results[name] for name in images}
+
+
+def custom_ocr_batch(images, resolution=SCREEN_RESOLUTION):
+    """Like custom_ocr_batch_with_confidence but only returns the recognized texts."""
+    return {
+        name: result[0]
+        for name, result in custom_ocr_batch_with_confidence(images, resolution).items()
+    }
+
+
+def custom_ocr_with_confidence(img, resolution=SCREEN_RESOLUTION):
+    return custom_ocr_batch_with_confidence({"segment": img}, resolution)["segment"]
+
+
+def custom_ocr(img, resolution=SCREEN_RESOLUTION):
+    return custom_ocr_batch({"segment": img}, resolution)["segment"]
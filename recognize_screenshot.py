@@ -23,4 +23,4 @@ w = img.shape[1]
 
 data = getResolutionDependentData((w, h))
 
-print("screen " + recognizeScreen(img, data["comparisonImages"], True).name + "!")
+print("screen " + recognizeScreen(img, data["comparisonRois"], True).name + "!")
@@ -1,4 +1,10 @@
-from ocr import custom_ocr
+from ocr import (
+    custom_ocr,
+    custom_ocr_batch_with_confidence,
+    custom_ocr_with_confidence,
+    ocr_cache,
+    warmup as warmupOcr,
+)
 from enum import Enum
 import signal
 import sys
@@ -8,8 +14,8 @@ from os.path import exists
 import os
 import json
 import copy
+import functools
 import keyboard
-import time
 import random
 import pyautogui
 
@@ -18,6 +24,7 @@ from core.config.loader import (
     maps,
     gamemodes,
     imageAreas,
+    getImageAreas,
     playthroughStats,
     towers,
     keybinds,
@@ -28,9 +35,34 @@ from core.config.manager import (
     mapsByCategory,
     categoryPages,
 )
-from core.automation.screen import recognizeScreen, getIngameOcrSegments, isBTD6Window
+from core.automation.screen import (
+    recognizeScreen,
+    cropComparisonRois,
+    reduceRoi,
+    getIngameOcrSegments,
+    cutOcrSegments,
+    captureOcrSegment,
+    isBTD6Window,
+    waitForScreen,
+)
+from core.automation.screen_hash import ScreenHashIndex
+from core.automation.screen_batch import ScreenBatchComparator
+from core.automation.screen_reduced import ReducedRecognitionCheck
+from core.automation.capture import RoiCapture, CaptureService
+from core.automation.frame_change import FrameChangeDetector
+from core.automation.frame_history import FrameHistory
 from core.automation.image import cutImage, findImageInImage
-from core.automation.input import sendKey, ahk
+from core.automation.input import (
+    sendKey,
+    screenshotRegion,
+    captureScreen,
+    click,
+    moveTo,
+    executeSequence,
+    clock,
+    ahk,
+)
+from core.platform.input.recorded import RecordedSessionEnded
 from core.playthrough.parser import (
     parseBTD6InstructionsFile,
     parseBTD6InstructionFileName,
@@ -50,6 +82,7 @@ from core.playthrough.stats import (
 from core.game.maps import findMapForPxPos
 from core.game.medals import getAvailableSandbox, updateMedalStatus
 from core.game.costs import upgradeRequiresConfirmation
+from core.game.value_tracker import IngameValueTracker
 from utils.display import customPrint
 from utils.position import getResolutionString, convertPositionsInString
 from utils.file import tupleToStr
@@ -57,6 +90,12 @@ from utils.file import tupleToStr
 smallActionDelay = 0.05
 actionDelay = 0.2
 menuChangeDelay = 1
+# maximum time to wait for the next screen when navigating menus
+menuChangeTimeout = 3
+
+# segments recognized with a lower confidence (for any character) are read again
+ocrMinConfidence = 0.9
+ocrMaxRereads = 2
 
 
 def getResolutionDependentData(resolution=pyautogui.size(), gamemode=""):
@@ -171,8 +210,20 @@ def getResolutionDependentData(resolution=pyautogui.size(), gamemode=""):
                 imagesDir + "collection_events/" + filename
             )
 
+    # reference areas are cropped once instead of on every comparison
+    areas = getImageAreas(resolution)
+    comparisonRois = cropComparisonRois(comparisonImages, areas)
+    gameStateRois = {
+        name: cutImage(
+            comparisonImages["game_state"][name], areas["compare"]["game_state"]
+        )
+        for name in ["game_playing_fast", "game_playing_slow", "game_paused"]
+    }
+
     return {
         "comparisonImages": comparisonImages,
+        "comparisonRois": comparisonRois,
+        "gameStateRois": gameStateRois,
         "locateImages": locateImages,
         "supportedModes": supportedModes,
         "resolution": resolution,
@@ -211,6 +262,46 @@ def getGamemodePosition(gamemode):
     return imageAreas["click"]["gamemode_positions"][gamemode]
 
 
+def getEvaluatedAreas(state, comparisonRois, segmentCoordinates):
+    """Areas evaluated in state (inclusive coordinates)."""
+    areas = [screenCfg[2] for screenCfg in comparisonRois]
+    if state == State.INGAME and segmentCoordinates is not None:
+        areas += [
+            [area[0], area[1], area[2] - 1, area[3] - 1]
+            for area in segmentCoordinates.values()
+        ]
+        areas.append(imageAreas["compare"]["game_state"])
+    return areas
+
+
+def getLikelyScreens(state, lastScreen):
+    """Screens recognizeScreen should compare first, the last screen followed by the usual screens of state."""
+    likelyScreensByState = {
+        State.INGAME: [
+            Screen.INGAME,
+            Screen.INGAME_PAUSED,
+            Screen.LEVELUP,
+            Screen.VICTORY_SUMMARY,
+            Screen.DEFEAT,
+        ],
+        State.GOTO_HOME: [Screen.STARTMENU],
+        State.GOTO_INGAME: [
+            Screen.STARTMENU,
+            Screen.MAP_SELECTION,
+            Screen.DIFFICULTY_SELECTION,
+            Screen.GAMEMODE_SELECTION,
+            Screen.OVERWRITE_SAVE,
+            Screen.INGAME,
+        ],
+        State.SELECT_HERO: [Screen.STARTMENU, Screen.HERO_SELECTION],
+        State.FIND_HARDEST_INCREASED_REWARDS_MAP: [
+            Screen.STARTMENU,
+            Screen.MAP_SELECTION,
+        ],
+    }
+    return [lastScreen] + likelyScreensByState.get(state, [])
+
+
 def getNextNonSellAction(steps):
     for step in steps:
         if step["action"] != "sell" and step["action"] != "await_round":
@@ -225,6 +316,41 @@ def getNextCostingAction(steps):
     return {"action": "nop", "cost": 0}
 
 
+def readOcrSegments(images, segmentCoordinates):
+    """
+    Recognize the given segments. Segments with low confidence are read again from
+    a fresh capture of only said segment instead of skipping the whole iteration.
+
+    Returns:
+        dict of segment name -> recognized text ("-1" if not recognized confidently)
+    """
+    ocrValues = custom_ocr_batch_with_confidence(images)
+    values = {}
+    for segment in ocrValues:
+        text, confidences = ocrValues[segment]
+        rereads = 0
+        while (
+            min(confidences, default=1) < ocrMinConfidence and rereads < ocrMaxRereads
+        ):
+            rereads += 1
+            text, confidences = custom_ocr_with_confidence(
+                captureOcrSegment(segmentCoordinates, segment)
+            )
+        if min(confidences, default=1) < ocrMinConfidence:
+            customPrint(
+                "low "
+                + segment
+                + " recognition confidence: "
+                + text
+                + " ("
+                + str(round(min(confidences), 2))
+                + ")"
+            )
+            text = "-1"
+        values[segment] = text
+    return values
+
+
 def sumAdjacentSells(steps):
     gain = 0
     for step in steps:
@@ -234,8 +360,34 @@ def sumAdjacentSells(steps):
     return gain
 
 
+def getPlacementSequence(action):
+    # input steps of a place action, executed at once by the input driver
+    # the waits are kept, the game needs them to register the key and the click
+    return [
+        ("move", action["pos"]),
+        ("sleep", actionDelay),
+        ("key", action["key"]),
+        ("sleep", actionDelay),
+        ("click", None),
+    ]
+
+
 exitAfterGame = False
 
+# recent frames and decisions, written to FRAME_HISTORY_DIR on failures (-fh)
+frameHistory = None
+FRAME_HISTORY_DIR = "frame_history"
+# number of consecutive ticks with unknown screen or unreadable money before the history is written
+FRAME_HISTORY_ERROR_TICKS = 10
+
+
+def dumpFrameHistory(reason):
+    if frameHistory is None:
+        return
+    path = frameHistory.dump(FRAME_HISTORY_DIR, reason)
+    if path:
+        customPrint("frame history written to " + path + "!")
+
 
 def setExitAfterGame():
     global exitAfterGame
@@ -251,8 +403,17 @@ def signalHandler(signum, frame):
     sys.exit(0)
 
 
+def dumpSignalHandler(signum, frame):
+    dumpFrameHistory("signal")
+
+
 def main():
+    global frameHistory
+
     signal.signal(signal.SIGINT, signalHandler)
+    # not available on windows
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, dumpSignalHandler)
 
     data = getResolutionDependentData()
 
@@ -260,7 +421,14 @@ def main():
         print("unsupported resolution! reference images missing!")
         return
 
-    comparisonImages = data["comparisonImages"]
+    comparisonRois = data["comparisonRois"]
+    gameStateRois = data["gameStateRois"]
+    screenRecognizer = None
+    reduceFactor = None
+    reducedCheck = None
+    roiCapture = None
+    captureService = None
+    frameChangeDetector = None
     locateImages = data["locateImages"]
     supportedModes = data["supportedModes"]
     resolution = data["resolution"]
@@ -334,6 +502,128 @@ def main():
         parsedArguments.append("-nv")
         handlePlaythroughValidation = ValidatedPlaythroughs.INCLUDE_ALL
 
+    # -hs: recognize screens by perceptual hashes of the compare areas
+    if len(np.where(argv == "-hs")[0]):
+        customPrint("recognizing screens by perceptual hashes!")
+        parsedArguments.append("-hs")
+        screenRecognizer = ScreenHashIndex(comparisonRois)
+
+    # -bs: compare all compare areas in a single vectorized pass
+    if len(np.where(argv == "-bs")[0]):
+        customPrint("comparing all screens in a single pass!")
+        parsedArguments.append("-bs")
+        screenRecognizer = ScreenBatchComparator(comparisonRois)
+
+    # -rc: only capture the areas evaluated in the current state instead of the whole screen
+    if len(np.where(argv == "-rc")[0]):
+        parsedArguments.append("-rc")
+        roiCapture = RoiCapture(resolution)
+        compareAreas = [screenCfg[2] for screenCfg in comparisonRois]
+        if not roiCapture.native:
+            # every area would cost a full screenshot
+            customPrint(
+                "-rc is ignored! the screen can't be captured partially on this platform!"
+            )
+            roiCapture = None
+        else:
+            customPrint(
+                "capturing only the evaluated areas! "
+                + str(roiCapture.capturedPixels(compareAreas))
+                + " pixels per tick instead of "
+                + str(resolution[0] * resolution[1])
+            )
+
+    # -bc: capture the whole screen in a background thread, each tick processes the newest frame
+    if len(np.where(argv == "-bc")[0]):
+        parsedArguments.append("-bc")
+        if os.environ.get("BTD6_RECORDED_SESSION"):
+            # the thread captures in real time, not on the virtual clock of the replay
+            customPrint("-bc is ignored when replaying a recorded session!")
+        else:
+            if roiCapture is not None:
+                # both would capture at the same time
+                customPrint("-rc is ignored when capturing in the background!")
+                roiCapture = None
+            customPrint("capturing in the background!")
+            captureService = CaptureService(
+                lambda out: screenshotRegion(
+                    (0, 0, resolution[0], resolution[1]), out
+                ),
+                (resolution[1], resolution[0], 3),
+            )
+
+    # -sf: reuse the recognized screen and OCR results while the evaluated areas don't change
+    if len(np.where(argv == "-sf")[0]):
+        customPrint("skipping recognition of unchanged frames!")
+        parsedArguments.append("-sf")
+        frameChangeDetector = FrameChangeDetector()
+
+    # -fh [size]: keep the last size (default 30) frames and decisions, written to disk on failures
+    iHistory = np.where(argv == "-fh")[0]
+    if len(iHistory):
+        parsedArguments.append("-fh")
+        historySize = 30
+        if len(argv) > iHistory[0] + 1 and str(argv[iHistory[0] + 1]).isdigit():
+            historySize = max(1, int(argv[iHistory[0] + 1]))
+            parsedArguments.append(argv[iHistory[0] + 1])
+        # -fhs <scale>: factor the kept frames are resized by (default 0.25), 1 keeps them replayable
+        historyScale = 0.25
+        iHistoryScale = np.where(argv == "-fhs")[0]
+        if len(iHistoryScale) and len(argv) > iHistoryScale[0] + 1:
+            parsedArguments.append("-fhs")
+            try:
+                historyScale = min(1, max(0.01, float(argv[iHistoryScale[0] + 1])))
+                parsedArguments.append(argv[iHistoryScale[0] + 1])
+            except ValueError:
+                customPrint("-fhs requires a number! keeping frames at 0.25!")
+        frameHistory = FrameHistory(historySize, historyScale)
+        customPrint(
+            "keeping the last "
+            + str(historySize)
+            + " frames at "
+            + str(historyScale)
+            + " of their size! written to "
+            + FRAME_HISTORY_DIR
+            + " when an objective fails, recognition keeps failing or on SIGUSR1"
+        )
+
+    # -gs [factor]: compare grayscale areas shrunk by factor (default 2) instead of the full colour areas
+    iReduce = np.where(argv == "-gs")[0]
+    if len(iReduce):
+        parsedArguments.append("-gs")
+        customPrint(
+            "-gs is experimental! its thresholds are only checked against the reference images, not against captures of the game!"
+        )
+        reduceFactor = 2
+        if len(argv) > iReduce[0] + 1 and str(argv[iReduce[0] + 1]).isdigit():
+            reduceFactor = max(1, int(argv[iReduce[0] + 1]))
+            parsedArguments.append(argv[iReduce[0] + 1])
+        comparisonRois = cropComparisonRois(
+            data["comparisonImages"], getImageAreas(resolution), reduceFactor
+        )
+        gameStateRois = {
+            name: reduceRoi(roi, reduceFactor) for name, roi in gameStateRois.items()
+        }
+        customPrint(
+            "comparing grayscale areas reduced by "
+            + str(reduceFactor)
+            + "! reference crops: "
+            + str(sum(roi.nbytes for _, roi, _, _ in data["comparisonRois"]))
+            + " -> "
+            + str(sum(roi.nbytes for _, roi, _, _ in comparisonRois))
+            + " bytes"
+        )
+        # the reduced screen recognition isn't used if screens are recognized by -hs or -bs
+        if screenRecognizer is None:
+            reducedCheck = ReducedRecognitionCheck(
+                data["comparisonRois"], comparisonRois
+            )
+            customPrint(
+                "every "
+                + str(reducedCheck.interval)
+                + "th frame is recognized in full colour as well! the time per tick and differing results are printed"
+            )
+
     iArg = 1
     if len(argv) <= iArg:
         customPrint(
@@ -934,6 +1224,9 @@ def main():
     if usesAllAvailablePlaythroughsList and len(allAvailablePlaythroughsList) == 0:
         customPrint("no playthroughs matching requirements found!")
 
+    # every remaining mode plays games: load the OCR model before the first ingame tick
+    warmupOcr()
+
     keyboard.add_hotkey("ctrl+space", setExitAfterGame)
 
     objectives = copy.deepcopy(originalObjectives)
@@ -945,10 +1238,7 @@ def main():
 
     gamesPlayed = 0
 
-    lastIterationBalance = -1
-    lastIterationRound = -1
-    lastIterationScreenshotAreas = []
-    lastIterationCost = 0
+    valueTracker = IngameValueTracker()
     iterationBalances = []
     thisIterationAction = None
     lastIterationAction = None
@@ -970,22 +1260,101 @@ def main():
     lastState = State.UNDEFINED
 
     unknownScreenHasWaited = False
+    unknownScreenTicks = 0
+    ocrErrorTicks = 0
 
     segmentCoordinates = None
+    lastOcrValues = None
+
+    # full screenshots are captured into the same buffer every tick
+    screenBuffer = np.empty((resolution[1], resolution[0], 3), dtype=np.uint8)
+    lastFrameTimestamp = None
+    if captureService is not None:
+        captureService.start()
+
+    # waits for screen changes poll only the compare areas (one full capture per poll
+    # where the screen can't be captured partially, see RoiCapture)
+    compareAreaCapture = RoiCapture(resolution)
+    compareAreas = [screenCfg[2] for screenCfg in comparisonRois]
+    captureCompareAreas = functools.partial(compareAreaCapture.capture, compareAreas)
 
     while True:
-        screenshot = np.array(pyautogui.screenshot())[:, :, ::-1].copy()
+        evaluatedAreas = getEvaluatedAreas(state, comparisonRois, segmentCoordinates)
+        # regions captured for this frame, None for the whole screen
+        capturedRegions = None
+        # the home button of the defeat screen is searched on the whole screen
+        if roiCapture is not None and state != State.GOTO_HOME:
+            screenshot = roiCapture.capture(evaluatedAreas)
+            capturedRegions = roiCapture.getRegions(evaluatedAreas)
+        elif captureService is not None:
+            # only waits if the newest frame has been processed already
+            latestFrame = captureService.waitForFrame(lastFrameTimestamp)
+            if latestFrame is None:
+                continue
+            screenshot, lastFrameTimestamp = latestFrame
+        else:
+            screenshot = screenshotRegion(
+                (0, 0, resolution[0], resolution[1]), screenBuffer
+            )
 
-        screen = recognizeScreen(screenshot, comparisonImages)
+        frameUnchanged = False
+        if frameChangeDetector is not None:
+            frameUnchanged = not frameChangeDetector.changed(screenshot, evaluatedAreas)
+            if not frameUnchanged:
+                lastOcrValues = None
+
+        if frameUnchanged and lastScreen != Screen.BTD6_UNFOCUSED:
+            # same screen as before, only the focus might have changed
+            activeWindow = ahk.get_active_window()
+            if activeWindow and isBTD6Window(activeWindow.title):
+                screen = lastScreen
+            else:
+                screen = Screen.BTD6_UNFOCUSED
+        else:
+            likelyScreens = getLikelyScreens(state, lastScreen)
+            screen = recognizeScreen(
+                screenshot,
+                comparisonRois,
+                likelyScreens=likelyScreens,
+                recognizer=screenRecognizer,
+            )
+            if reducedCheck is not None and screen != Screen.BTD6_UNFOCUSED:
+                mismatch = reducedCheck.check(screenshot, likelyScreens)
+                if mismatch:
+                    customPrint(
+                        "reduced recognition differs! full colour: "
+                        + mismatch[0].name
+                        + ", reduced: "
+                        + mismatch[1].name
+                    )
 
         if screen != lastScreen:
-            customPrint("screen " + screen.name + "!")
+            if isinstance(screenRecognizer, ScreenBatchComparator):
+                customPrint(
+                    "screen "
+                    + screen.name
+                    + "! (margin to the next best screen: "
+                    + str(round(screenRecognizer.lastMargin, 3))
+                    + ")"
+                )
+            else:
+                customPrint("screen " + screen.name + "!")
+
+        if frameHistory is not None:
+            frameHistory.add(
+                screenshot, state, screen, clock.time(), regions=capturedRegions
+            )
+            unknownScreenTicks = (
+                unknownScreenTicks + 1 if screen == Screen.UNKNOWN else 0
+            )
+            if unknownScreenTicks == FRAME_HISTORY_ERROR_TICKS:
+                dumpFrameHistory("unknown screen")
 
         if screen == Screen.BTD6_UNFOCUSED:
             # Wait for window to regain focus before continuing
             if state == State.INGAME:
                 customPrint("waiting for BTD6 window to regain focus...")
-                time.sleep(1)
+                clock.sleep(1)
                 continue
             pass
         # don't do anything when ctrl is pressed: useful for alt + tab / sending SIGINT(ctrl + c) to the script
@@ -1221,6 +1590,7 @@ def main():
                     + lastScreen.name
                     + ")!"
                 )
+                dumpFrameHistory("objective failed")
                 if repeatObjectives:
                     state = State.MANAGE_OBJECTIVES
                 else:
@@ -1240,6 +1610,28 @@ def main():
         elif state == State.IDLE:
             pass
         elif state == State.EXIT:
+            ocrCacheStats = ocr_cache.stats()
+            customPrint(
+                f"ocr cache: {ocrCacheStats['hits']} hits, {ocrCacheStats['misses']} misses"
+            )
+            if frameChangeDetector is not None:
+                frameStats = frameChangeDetector.stats()
+                customPrint(
+                    f"unchanged frames: {frameStats['skipped']} skipped, {frameStats['processed']} processed"
+                )
+            if captureService is not None:
+                customPrint(
+                    f"frames captured in the background: {captureService.captured}"
+                )
+                captureService.stop()
+            if reducedCheck is not None and reducedCheck.checked:
+                reducedStats = reducedCheck.stats()
+                customPrint(
+                    f"reduced screen recognition on {reducedStats['checked']} frames: {reducedStats['reducedMs']:.3f} ms instead of {reducedStats['fullMs']:.3f} ms per tick, {reducedStats['mismatches']} recognized differently"
+                )
+                customPrint(
+                    f"reduced diffs: matching screen at most {reducedStats['maxMatchingDiff']:.4f}, other screens at least {reducedStats['minOtherDiff']:.4f}, REDUCED_MATCH_DIFF {reducedStats['matchDiff']}"
+                )
             customPrint("goal EXIT! exiting!")
             return
         elif state == State.GOTO_HOME:
@@ -1252,11 +1644,11 @@ def main():
                     sendKey("{Esc}")
                 else:
                     unknownScreenHasWaited = True
-                    time.sleep(2)
+                    clock.sleep(2)
             elif screen == Screen.INGAME:
                 sendKey("{Esc}")
             elif screen == Screen.INGAME_PAUSED:
-                pyautogui.click(imageAreas["click"]["screen_ingame_paused_button_home"])
+                click(imageAreas["click"]["screen_ingame_paused_button_home"])
             elif screen == Screen.HERO_SELECTION:
                 sendKey("{Esc}")
             elif screen == Screen.GAMEMODE_SELECTION:
@@ -1269,30 +1661,28 @@ def main():
                 result = cv2.matchTemplate(
                     screenshot, locateImages["button_home"], cv2.TM_SQDIFF_NORMED
                 )
-                pyautogui.click(cv2.minMaxLoc(result)[2])
+                click(cv2.minMaxLoc(result)[2])
             elif screen == Screen.VICTORY_SUMMARY:
-                pyautogui.click(
-                    imageAreas["click"]["screen_victory_summary_button_next"]
-                )
+                click(imageAreas["click"]["screen_victory_summary_button_next"])
             elif screen == Screen.VICTORY:
-                pyautogui.click(imageAreas["click"]["screen_victory_button_home"])
+                click(imageAreas["click"]["screen_victory_button_home"])
             elif screen == Screen.OVERWRITE_SAVE:
                 sendKey("{Esc}")
             elif screen == Screen.LEVELUP:
-                pyautogui.click(100, 100)
-                time.sleep(menuChangeDelay)
-                pyautogui.click(100, 100)
+                click((100, 100))
+                clock.sleep(menuChangeDelay)
+                click((100, 100))
             elif screen == Screen.INSTA_GRANTED:
-                pyautogui.click(100, 100)
-                time.sleep(menuChangeDelay)
+                click((100, 100))
+                clock.sleep(menuChangeDelay)
             elif screen == Screen.INSTA_CLAIMED:
-                pyautogui.click(imageAreas["click"]["insta_claimed"])
-                time.sleep(menuChangeDelay)
+                click(imageAreas["click"]["insta_claimed"])
+                clock.sleep(menuChangeDelay)
             elif screen == Screen.COLLECTION_CLAIM_CHEST:
-                pyautogui.click(imageAreas["click"]["collection_claim_chest"])
-                time.sleep(menuChangeDelay * 2)
+                click(imageAreas["click"]["collection_claim_chest"])
+                clock.sleep(menuChangeDelay * 2)
                 while True:
-                    newScreenshot = np.array(pyautogui.screenshot())[:, :, ::-1].copy()
+                    newScreenshot = captureScreen()
                     result = [
                         cv2.minMaxLoc(
                             cv2.matchTemplate(
@@ -1305,59 +1695,89 @@ def main():
                         for i in [0, 2]
                     ]
                     if result[0] < 0.01:
-                        pyautogui.click(result[1])
-                        time.sleep(menuChangeDelay * 2)
-                        pyautogui.click(result[1])
-                        time.sleep(menuChangeDelay * 2)
+                        click(result[1])
+                        clock.sleep(menuChangeDelay * 2)
+                        click(result[1])
+                        clock.sleep(menuChangeDelay * 2)
                     else:
                         break
-                pyautogui.click(imageAreas["click"]["collection_claim_chest_done"])
-                time.sleep(menuChangeDelay)
+                click(imageAreas["click"]["collection_claim_chest_done"])
+                clock.sleep(menuChangeDelay)
                 sendKey("{Esc}")
             elif screen == Screen.APOPALYPSE_HINT:
-                pyautogui.click(
-                    imageAreas["click"]["gamemode_apopalypse_message_confirmation"]
-                )
+                click(imageAreas["click"]["gamemode_apopalypse_message_confirmation"])
         elif state == State.GOTO_INGAME:
             if screen == Screen.STARTMENU:
-                pyautogui.click(imageAreas["click"]["screen_startmenu_button_play"])
-                time.sleep(menuChangeDelay)
-                if mapConfig["category"] == "beginner":
-                    pyautogui.click(imageAreas["click"]["map_categories"]["advanced"])
-                    time.sleep(menuChangeDelay)
-                    pyautogui.click(
-                        imageAreas["click"]["map_categories"][mapConfig["category"]]
+                click(imageAreas["click"]["screen_startmenu_button_play"])
+                if (
+                    waitForScreen(
+                        Screen.MAP_SELECTION,
+                        captureCompareAreas,
+                        comparisonRois,
+                        menuChangeTimeout,
+                        recognizer=screenRecognizer,
                     )
-                    time.sleep(menuChangeDelay)
+                    is None
+                ):
+                    # don't click blindly on whatever is shown instead
+                    customPrint("MAP_SELECTION not shown! evaluating the screen again!")
+                    continue
+                if mapConfig["category"] == "beginner":
+                    click(imageAreas["click"]["map_categories"]["advanced"])
+                    clock.sleep(menuChangeDelay)
+                    click(imageAreas["click"]["map_categories"][mapConfig["category"]])
+                    clock.sleep(menuChangeDelay)
                 else:
-                    pyautogui.click(imageAreas["click"]["map_categories"]["beginner"])
-                    time.sleep(menuChangeDelay)
-                    pyautogui.click(
-                        imageAreas["click"]["map_categories"][mapConfig["category"]]
-                    )
-                    time.sleep(menuChangeDelay)
+                    click(imageAreas["click"]["map_categories"]["beginner"])
+                    clock.sleep(menuChangeDelay)
+                    click(imageAreas["click"]["map_categories"][mapConfig["category"]])
+                    clock.sleep(menuChangeDelay)
                 tmpClicks = mapConfig["page"]
                 while tmpClicks > 0:
-                    pyautogui.click(
-                        imageAreas["click"]["map_categories"][mapConfig["category"]]
-                    )
+                    click(imageAreas["click"]["map_categories"][mapConfig["category"]])
                     tmpClicks -= 1
-                    time.sleep(menuChangeDelay)
-                pyautogui.click(imageAreas["click"]["map_positions"][mapConfig["pos"]])
-                time.sleep(menuChangeDelay)
-                pyautogui.click(
+                    clock.sleep(menuChangeDelay)
+                click(imageAreas["click"]["map_positions"][mapConfig["pos"]])
+                if (
+                    waitForScreen(
+                        Screen.DIFFICULTY_SELECTION,
+                        captureCompareAreas,
+                        comparisonRois,
+                        menuChangeTimeout,
+                        recognizer=screenRecognizer,
+                    )
+                    is None
+                ):
+                    # don't click blindly on whatever is shown instead
+                    customPrint(
+                        "DIFFICULTY_SELECTION not shown! evaluating the screen again!"
+                    )
+                    continue
+                click(
                     imageAreas["click"]["gamedifficulty_positions"][
                         mapConfig["difficulty"]
                     ]
                 )
-                time.sleep(menuChangeDelay)
-                pyautogui.click(getGamemodePosition(mapConfig["gamemode"]))
+                if (
+                    waitForScreen(
+                        Screen.GAMEMODE_SELECTION,
+                        captureCompareAreas,
+                        comparisonRois,
+                        menuChangeTimeout,
+                        recognizer=screenRecognizer,
+                    )
+                    is None
+                ):
+                    # don't click blindly on whatever is shown instead
+                    customPrint(
+                        "GAMEMODE_SELECTION not shown! evaluating the screen again!"
+                    )
+                    continue
+                click(getGamemodePosition(mapConfig["gamemode"]))
             elif screen == Screen.OVERWRITE_SAVE:
-                pyautogui.click(imageAreas["click"]["screen_overwrite_save_button_ok"])
+                click(imageAreas["click"]["screen_overwrite_save_button_ok"])
             elif screen == Screen.APOPALYPSE_HINT:
-                pyautogui.click(
-                    imageAreas["click"]["gamemode_apopalypse_message_confirmation"]
-                )
+                click(imageAreas["click"]["gamemode_apopalypse_message_confirmation"])
             elif screen == Screen.INGAME:
                 customPrint("goal GOTO_INGAME fullfilled!")
                 customPrint(
@@ -1371,9 +1791,8 @@ def main():
                         "time": [],
                         "result": PlaythroughResult.UNDEFINED,
                     }
-                    lastPlaythroughStats["time"].append(("start", time.time()))
-                lastIterationBalance = -1
-                lastIterationCost = 0
+                    lastPlaythroughStats["time"].append(("start", clock.time()))
+                valueTracker.reset()
                 state = State.UNDEFINED
             elif screen == Screen.UNKNOWN:
                 pass
@@ -1383,17 +1802,25 @@ def main():
                 lastStateTransitionSuccessful = False
         elif state == State.SELECT_HERO:
             if screen == Screen.STARTMENU:
-                pyautogui.click(
-                    imageAreas["click"]["screen_startmenu_button_hero_selection"]
-                )
-                time.sleep(menuChangeDelay)
-                pyautogui.click(
-                    imageAreas["click"]["hero_positions"][mapConfig["hero"]]
-                )
-                time.sleep(menuChangeDelay)
-                pyautogui.click(
-                    imageAreas["click"]["screen_hero_selection_select_hero"]
-                )
+                click(imageAreas["click"]["screen_startmenu_button_hero_selection"])
+                if (
+                    waitForScreen(
+                        Screen.HERO_SELECTION,
+                        captureCompareAreas,
+                        comparisonRois,
+                        menuChangeTimeout,
+                        recognizer=screenRecognizer,
+                    )
+                    is None
+                ):
+                    # don't click blindly on whatever is shown instead
+                    customPrint(
+                        "HERO_SELECTION not shown! evaluating the screen again!"
+                    )
+                    continue
+                click(imageAreas["click"]["hero_positions"][mapConfig["hero"]])
+                clock.sleep(menuChangeDelay)
+                click(imageAreas["click"]["screen_hero_selection_select_hero"])
                 customPrint("goal SELECT_HERO " + mapConfig["hero"] + " fullfilled!")
                 lastHeroSelected = mapConfig["hero"]
                 state = State.UNDEFINED
@@ -1405,11 +1832,23 @@ def main():
                 lastStateTransitionSuccessful = False
         elif state == State.FIND_HARDEST_INCREASED_REWARDS_MAP:
             if screen == Screen.STARTMENU:
-                pyautogui.click(imageAreas["click"]["screen_startmenu_button_play"])
-                time.sleep(menuChangeDelay)
+                click(imageAreas["click"]["screen_startmenu_button_play"])
+                if (
+                    waitForScreen(
+                        Screen.MAP_SELECTION,
+                        captureCompareAreas,
+                        comparisonRois,
+                        menuChangeTimeout,
+                        recognizer=screenRecognizer,
+                    )
+                    is None
+                ):
+                    # don't click blindly on whatever is shown instead
+                    customPrint("MAP_SELECTION not shown! evaluating the screen again!")
+                    continue
 
                 if categoryRestriction:
-                    pyautogui.click(
+                    click(
                         imageAreas["click"]["map_categories"][
                             (
                                 "advanced"
@@ -1418,20 +1857,18 @@ def main():
                             )
                         ]
                     )
-                    time.sleep(menuChangeDelay)
+                    clock.sleep(menuChangeDelay)
 
                     mapname = None
                     for page in range(0, categoryPages[categoryRestriction]):
-                        pyautogui.click(
+                        click(
                             imageAreas["click"]["map_categories"][categoryRestriction]
                         )
                         if collectionEvent == "golden_bloon":
-                            time.sleep(4)
+                            clock.sleep(4)
                         else:
-                            time.sleep(menuChangeDelay)
-                        newScreenshot = np.array(pyautogui.screenshot())[
-                            :, :, ::-1
-                        ].copy()
+                            clock.sleep(menuChangeDelay)
+                        newScreenshot = captureScreen()
                         result = findImageInImage(
                             newScreenshot, locateImages["collection"][collectionEvent]
                         )
@@ -1454,7 +1891,7 @@ def main():
                     iTmp = 0
                     for category in reversed(list(mapsByCategory.keys())):
                         if iTmp == 0:
-                            pyautogui.click(
+                            click(
                                 imageAreas["click"]["map_categories"][
                                     (
                                         "advanced"
@@ -1463,20 +1900,16 @@ def main():
                                     )
                                 ]
                             )
-                            time.sleep(menuChangeDelay)
+                            clock.sleep(menuChangeDelay)
 
                         mapname = None
                         for page in range(0, categoryPages[category]):
-                            pyautogui.click(
-                                imageAreas["click"]["map_categories"][category]
-                            )
+                            click(imageAreas["click"]["map_categories"][category])
                             if collectionEvent == "golden_bloon":
-                                time.sleep(4)
+                                clock.sleep(4)
                             else:
-                                time.sleep(menuChangeDelay)
-                            newScreenshot = np.array(pyautogui.screenshot())[
-                                :, :, ::-1
-                            ].copy()
+                                clock.sleep(menuChangeDelay)
+                            newScreenshot = captureScreen()
                             result = findImageInImage(
                                 newScreenshot,
                                 locateImages["collection"][collectionEvent],
@@ -1516,8 +1949,8 @@ def main():
         elif state == State.INGAME:
             if screen == Screen.INGAME_PAUSED:
                 if lastScreen != screen and logStats:
-                    lastPlaythroughStats["time"].append(("stop", time.time()))
-                time.sleep(2)
+                    lastPlaythroughStats["time"].append(("stop", clock.time()))
+                clock.sleep(2)
                 if isBTD6Window(ahk.get_active_window().title):
                     sendKey("{Esc}")
             elif screen == Screen.UNKNOWN:
@@ -1526,20 +1959,20 @@ def main():
                     sendKey("{Esc}")
                 else:
                     unknownScreenHasWaited = True
-                    time.sleep(2)
+                    clock.sleep(2)
             elif screen == Screen.LEVELUP:
-                pyautogui.click(100, 100)
-                time.sleep(menuChangeDelay)
-                pyautogui.click(100, 100)
+                click((100, 100))
+                clock.sleep(menuChangeDelay)
+                click((100, 100))
             elif screen == Screen.INSTA_GRANTED:
-                pyautogui.click(100, 100)
-                time.sleep(menuChangeDelay)
+                click((100, 100))
+                clock.sleep(menuChangeDelay)
             elif screen == Screen.INSTA_CLAIMED:
-                pyautogui.click(imageAreas["click"]["insta_claimed"])
-                time.sleep(menuChangeDelay)
+                click(imageAreas["click"]["insta_claimed"])
+                clock.sleep(menuChangeDelay)
             elif screen == Screen.VICTORY_SUMMARY:
                 if logStats:
-                    lastPlaythroughStats["time"].append(("stop", time.time()))
+                    lastPlaythroughStats["time"].append(("stop", clock.time()))
                     lastPlaythroughStats["result"] = PlaythroughResult.WIN
                     updateStatsFile(mapConfig["filename"], lastPlaythroughStats)
                 gamesPlayed += 1
@@ -1564,7 +1997,7 @@ def main():
                 state = State.UNDEFINED
             elif screen == Screen.DEFEAT:
                 if logStats:
-                    lastPlaythroughStats["time"].append(("stop", time.time()))
+                    lastPlaythroughStats["time"].append(("stop", clock.time()))
                     lastPlaythroughStats["result"] = PlaythroughResult.DEFEAT
                     updateStatsFile(mapConfig["filename"], lastPlaythroughStats)
                 objectiveFailed = True
@@ -1587,28 +2020,41 @@ def main():
                 state = State.UNDEFINED
             elif screen == Screen.INGAME:
                 if lastScreen != screen and logStats:
-                    lastPlaythroughStats["time"].append(("start", time.time()))
+                    lastPlaythroughStats["time"].append(("start", clock.time()))
 
-                images = [
-                    screenshot[
-                        segmentCoordinates[segment][1] : segmentCoordinates[segment][3],
-                        segmentCoordinates[segment][0] : segmentCoordinates[segment][2],
-                    ]
-                    for segment in segmentCoordinates
-                ]
+                images = cutOcrSegments(screenshot, segmentCoordinates)
 
                 currentValues = {}
                 thisIterationCost = 0
                 thisIterationAction = None
-                skippingIteration = False
 
+                if frameUnchanged and lastOcrValues is not None:
+                    ocrValues = lastOcrValues
+                else:
+                    # money and round are recognized with a single model call
+                    ocrValues = readOcrSegments(
+                        {"money": images["money"], "round": images["round"]},
+                        segmentCoordinates,
+                    )
+                    lastOcrValues = ocrValues
                 try:
-                    currentValues["money"] = int(custom_ocr(images[2]))
-                    currentValues["round"] = int(custom_ocr(images[3]).split("/")[0])
+                    currentValues["money"] = int(ocrValues["money"])
+                    currentValues["round"] = int(ocrValues["round"].split("/")[0])
                 except ValueError:
                     currentValues["money"] = -1
                     currentValues["round"] = -1
 
+                valueTracker.update(
+                    currentValues["money"], currentValues["round"], clock.time()
+                )
+
+                if frameHistory is not None:
+                    ocrErrorTicks = (
+                        ocrErrorTicks + 1 if currentValues["money"] == -1 else 0
+                    )
+                    if ocrErrorTicks == FRAME_HISTORY_ERROR_TICKS:
+                        dumpFrameHistory("ocr error")
+
                 # to prevent random explosion particles that were recognized as digits from messing up the game
                 # still possible: if it habens 2 times in a row
                 # potential solution: when placing: check if pixel changed colour(or even is of correct colour) - potentially blocked by particles/projectiles
@@ -1657,11 +2103,11 @@ def main():
 
                 if mode == Mode.VALIDATE_PLAYTHROUGHS:
                     if (
-                        lastIterationBalance != -1
+                        valueTracker.last_reading != -1
                         and currentValues["money"]
-                        != lastIterationBalance - lastIterationCost
+                        != valueTracker.last_reading - valueTracker.last_spend
                     ):
-                        if currentValues["money"] == lastIterationBalance:
+                        if currentValues["money"] == valueTracker.last_reading:
                             customPrint(
                                 "action: " + str(lastIterationAction) + " failed!"
                             )
@@ -1670,25 +2116,47 @@ def main():
                         else:
                             customPrint(
                                 "pricing error! expected cost: "
-                                + str(lastIterationCost)
+                                + str(valueTracker.last_spend)
                                 + ", detected cost: "
-                                + str(lastIterationBalance - currentValues["money"])
+                                + str(
+                                    valueTracker.last_reading - currentValues["money"]
+                                )
                                 + ". Is monkey knowledge disabled?"
                             )
                 elif mode == Mode.VALIDATE_COSTS:
-                    if lastIterationBalance != -1 and lastIterationAction:
+                    if valueTracker.last_reading != -1 and lastIterationAction:
                         if lastIterationAction["action"] == "place":
                             costs[lastIterationAction["extra"]["group"]][
                                 lastIterationAction["extra"]["type"]
                             ]["base"] = int(
-                                lastIterationBalance - currentValues["money"]
+                                valueTracker.last_reading - currentValues["money"]
                             )
                         elif lastIterationAction["action"] == "upgrade":
                             costs[lastIterationAction["extra"]["group"]][
                                 lastIterationAction["extra"]["type"]
                             ]["upgrades"][lastIterationAction["extra"]["upgrade"][0]][
                                 lastIterationAction["extra"]["upgrade"][1] - 1
-                            ] = int(lastIterationBalance - currentValues["money"])
+                            ] = int(valueTracker.last_reading - currentValues["money"])
+                else:
+                    # readings are filtered by valueTracker, no need to skip the tick
+                    if valueTracker.money_inconsistent:
+                        customPrint(
+                            "potential cash recognition error: "
+                            + str(valueTracker.expected_money)
+                            + " -> "
+                            + str(currentValues["money"])
+                        )
+                    if (
+                        valueTracker.round_inconsistent
+                        and len(mapConfig["steps"])
+                        and mapConfig["steps"][0]["action"] == "await_round"
+                    ):
+                        customPrint(
+                            "potential round recognition error: "
+                            + str(valueTracker.round)
+                            + " -> "
+                            + str(currentValues["round"])
+                        )
 
                 if (
                     mode == Mode.VALIDATE_PLAYTHROUGHS
@@ -1702,6 +2170,7 @@ def main():
                 elif (
                     currentValues["money"] == -1
                     or currentValues["round"] == -1
+                    and valueTracker.round == -1
                     and len(mapConfig["steps"])
                     and mapConfig["steps"][0]["action"] == "await_round"
                 ):
@@ -1711,60 +2180,20 @@ def main():
                         + ", round: "
                         + str(currentValues["round"])
                     )
-                elif (
-                    mode != Mode.VALIDATE_COSTS
-                    and lastIterationBalance - lastIterationCost
-                    > currentValues["money"]
-                ):
-                    customPrint(
-                        "potential cash recognition error: "
-                        + str(lastIterationBalance)
-                        + " - "
-                        + str(lastIterationCost)
-                        + " -> "
-                        + str(currentValues["money"])
-                    )
-                    # cv2.imwrite('tmp_images/' + time.strftime("%Y-%m-%d_%H-%M-%S") + '_' + str(lastIterationBalance) + '.png', lastIterationScreenshotAreas[2])
-                    # cv2.imwrite('tmp_images/' + time.strftime("%Y-%m-%d_%H-%M-%S") + '_' + str(currentValues['money']) + '.png', images[2])
-                    skippingIteration = True
-                elif (
-                    mode != Mode.VALIDATE_COSTS
-                    and (
-                        currentValues["round"] - lastIterationRound > 1
-                        or lastIterationRound > currentValues["round"]
-                    )
-                    and len(mapConfig["steps"])
-                    and mapConfig["steps"][0]["action"] == "await_round"
-                ):
-                    customPrint(
-                        "potential round recognition error: "
-                        + str(lastIterationRound)
-                        + " -> "
-                        + str(currentValues["round"])
-                    )
-                    skippingIteration = True
                 elif len(mapConfig["steps"]) and (
                     (
                         mapConfig["steps"][0]["action"] != "sell"
                         and mapConfig["steps"][0]["action"] != "await_round"
-                        and min(
-                            currentValues["money"],
-                            lastIterationBalance - lastIterationCost,
-                        )
-                        >= mapConfig["steps"][0]["cost"]
+                        and valueTracker.money >= mapConfig["steps"][0]["cost"]
                     )
                     or mapConfig["gamemode"] == "deflation"
                     or mapConfig["steps"][0]["action"] == "await_round"
-                    and currentValues["round"] >= mapConfig["steps"][0]["round"]
+                    and valueTracker.round >= mapConfig["steps"][0]["round"]
                     or mapConfig["steps"][0]["action"] == "await_round"
                     and mode == Mode.VALIDATE_PLAYTHROUGHS
                     or (
                         (mapConfig["steps"][0]["action"] == "sell")
-                        and min(
-                            currentValues["money"],
-                            lastIterationBalance - lastIterationCost,
-                        )
-                        + sumAdjacentSells(mapConfig["steps"])
+                        and valueTracker.money + sumAdjacentSells(mapConfig["steps"])
                         >= getNextNonSellAction(mapConfig["steps"])["cost"]
                     )
                 ):
@@ -1783,14 +2212,14 @@ def main():
                                 if attempt > 0:
                                     customPrint(f"retrying hero placement (attempt {attempt + 1}/{maxRetries})...")
                                     # Click screen to dismiss any popups/hints that might be blocking
-                                    pyautogui.click(100, 100)
-                                    time.sleep(actionDelay)
+                                    click((100, 100))
+                                    clock.sleep(actionDelay)
                                 
                                 # Verify window has focus before placing
                                 activeWindow = ahk.get_active_window()
                                 if not activeWindow or not isBTD6Window(activeWindow.title):
                                     customPrint("BTD6 window lost focus during placement, waiting...")
-                                    time.sleep(1)
+                                    clock.sleep(1)
                                     # Check again after waiting
                                     activeWindow = ahk.get_active_window()
                                     if not activeWindow or not isBTD6Window(activeWindow.title):
@@ -1801,19 +2230,14 @@ def main():
                                 moneyBefore = currentValues["money"]
                                 
                                 # Perform placement
-                                pyautogui.moveTo(action["pos"])
-                                time.sleep(actionDelay)
-                                sendKey(action["key"])
-                                time.sleep(actionDelay)
-                                pyautogui.click()
-                                time.sleep(actionDelay)  # Wait for placement to register
+                                executeSequence(getPlacementSequence(action))
+                                clock.sleep(actionDelay)  # Wait for placement to register
                                 
                                 # Verify placement by checking if money decreased
-                                newScreenshot = np.array(pyautogui.screenshot())[:, :, ::-1].copy()
-                                moneyImage = newScreenshot[
-                                    segmentCoordinates["money"][1] : segmentCoordinates["money"][3],
-                                    segmentCoordinates["money"][0] : segmentCoordinates["money"][2],
-                                ]
+                                newScreenshot = captureScreen()
+                                moneyImage = cutOcrSegments(
+                                    newScreenshot, segmentCoordinates, ["money"]
+                                )["money"]
                                 try:
                                     moneyAfter = int(custom_ocr(moneyImage))
                                     if moneyAfter < moneyBefore or mapConfig["gamemode"] == "deflation":
@@ -1833,38 +2257,40 @@ def main():
                                 thisIterationCost = 0
                         else:
                             # Regular placement for non-hero units
-                            pyautogui.moveTo(action["pos"])
-                            time.sleep(actionDelay)
-                            sendKey(action["key"])
-                            time.sleep(actionDelay)
-                            pyautogui.click()
+                            executeSequence(getPlacementSequence(action))
                     elif (
                         action["action"] == "upgrade"
                         or action["action"] == "retarget"
                         or action["action"] == "special"
                     ):
+                        # the input of all merged actions is collected and executed at once
                         # game hints potentially blocking monkeys
-                        pyautogui.click(action["pos"])
-                        time.sleep(actionDelay)
+                        inputSequence = [
+                            ("click", action["pos"]),
+                            ("sleep", actionDelay),
+                        ]
                         actionTmp = None
                         while action:
                             if "to" in action:
-                                pyautogui.moveTo(action["to"])
-                                time.sleep(smallActionDelay)
+                                inputSequence += [
+                                    ("move", action["to"]),
+                                    ("sleep", smallActionDelay),
+                                ]
                             if action["action"] == "click":
-                                time.sleep(actionDelay)
-                                pyautogui.moveTo(action["pos"])
-                                pyautogui.click()
-                                time.sleep(actionDelay)
+                                inputSequence += [
+                                    ("sleep", actionDelay),
+                                    ("click", action["pos"]),
+                                    ("sleep", actionDelay),
+                                ]
                             else:
-                                sendKey(action["key"])
+                                inputSequence.append(("key", action["key"]))
                             if (
                                 "to" in action
                                 and mapConfig["monkeys"][action["name"]]["type"]
                                 == "mortar"
                             ):
-                                pyautogui.click()
-                            time.sleep(smallActionDelay)
+                                inputSequence.append(("click", None))
+                            inputSequence.append(("sleep", smallActionDelay))
                             actionTmp = action
                             if (
                                 len(mapConfig["steps"])
@@ -1881,12 +2307,16 @@ def main():
                             else:
                                 action = None
                         action = actionTmp
-                        sendKey("{Esc}")
+                        inputSequence.append(("key", "{Esc}"))
+                        executeSequence(inputSequence)
                     elif action["action"] == "sell":
-                        pyautogui.moveTo(action["pos"])
-                        pyautogui.click()
-                        time.sleep(actionDelay)
-                        sendKey(action["key"])
+                        executeSequence(
+                            [
+                                ("click", action["pos"]),
+                                ("sleep", actionDelay),
+                                ("key", action["key"]),
+                            ]
+                        )
                     elif action["action"] == "remove":
                         customPrint(
                             "removing obstacle at "
@@ -1894,18 +2324,18 @@ def main():
                             + " for "
                             + str(action["cost"])
                         )
-                        pyautogui.moveTo(action["pos"])
-                        pyautogui.click()
-                        time.sleep(menuChangeDelay)
+                        moveTo(action["pos"])
+                        click()
+                        clock.sleep(menuChangeDelay)
                         result = cv2.matchTemplate(
-                            np.array(pyautogui.screenshot())[:, :, ::-1].copy(),
+                            captureScreen(),
                             locateImages["remove_obstacle_confirm_button"],
                             cv2.TM_SQDIFF_NORMED,
                         )
-                        pyautogui.click(cv2.minMaxLoc(result)[2])
+                        click(cv2.minMaxLoc(result)[2])
                     elif action["action"] == "click":
-                        pyautogui.moveTo(action["pos"])
-                        pyautogui.click()
+                        moveTo(action["pos"])
+                        click()
                     elif action["action"] == "press":
                         sendKey(action["key"])
                     elif action["action"] == "speed":
@@ -1917,46 +2347,30 @@ def main():
                 elif (
                     mode in [Mode.VALIDATE_PLAYTHROUGHS, Mode.VALIDATE_COSTS]
                     and len(mapConfig["steps"]) == 0
-                    and lastIterationCost == 0
+                    and valueTracker.last_spend == 0
                 ):
                     state = State.UNDEFINED
 
                 if (
                     not doAllStepsBeforeStart
                     and mapConfig["gamemode"] != "deflation"
-                    and not skippingIteration
                     and getNextCostingAction(mapConfig["steps"])["cost"]
-                    > min(
-                        currentValues["money"], lastIterationBalance - lastIterationCost
-                    )
+                    > valueTracker.money
                 ) or len(mapConfig["steps"]) == 0:
                     bestMatchDiff = None
                     gameState = None
-                    for screenCfg in [
-                        (
-                            "game_playing_fast",
-                            comparisonImages["game_state"]["game_playing_fast"],
-                            imageAreas["compare"]["game_state"],
-                        ),
-                        (
-                            "game_playing_slow",
-                            comparisonImages["game_state"]["game_playing_slow"],
-                            imageAreas["compare"]["game_state"],
-                        ),
-                        (
-                            "game_paused",
-                            comparisonImages["game_state"]["game_paused"],
-                            imageAreas["compare"]["game_state"],
-                        ),
-                    ]:
+                    gameStateArea = cutImage(
+                        screenshot, imageAreas["compare"]["game_state"]
+                    )
+                    if reduceFactor:
+                        gameStateArea = reduceRoi(gameStateArea, reduceFactor)
+                    for gameStateName, gameStateRoi in gameStateRois.items():
                         diff = cv2.matchTemplate(
-                            cutImage(screenshot, screenCfg[2]),
-                            cutImage(screenCfg[1], screenCfg[2]),
-                            cv2.TM_SQDIFF_NORMED,
+                            gameStateArea, gameStateRoi, cv2.TM_SQDIFF_NORMED
                         )[0][0]
                         if bestMatchDiff is None or diff < bestMatchDiff:
                             bestMatchDiff = diff
-                            gameState = screenCfg[0]
+                            gameState = gameStateName
 
                     if gameState == "game_playing_fast" and not fast:
                         sendKey(keybinds["others"]["play"])
@@ -1965,13 +2379,9 @@ def main():
                     elif gameState == "game_paused":
                         sendKey(keybinds["others"]["play"])
 
-                lastIterationScreenshotAreas = images
-                lastIterationBalance = currentValues["money"]
-                lastIterationCost = thisIterationCost
+                valueTracker.spend(thisIterationCost)
                 lastIterationAction = thisIterationAction
 
-                lastIterationRound = currentValues["round"]
-
                 iterationBalances.append((currentValues["money"], thisIterationCost))
             else:
                 customPrint("task INGAME, but not in related screen!")
@@ -1984,11 +2394,45 @@ def main():
         if state != lastState:
             customPrint("new state " + state.name + "!")
 
+        if frameHistory is not None:
+            decision = "next state " + state.name
+            if screen == Screen.INGAME and state == State.INGAME:
+                decision += (
+                    ", money "
+                    + str(valueTracker.money)
+                    + ", round "
+                    + str(valueTracker.round)
+                    + ", income "
+                    + str(round(valueTracker.income_rate, 1))
+                    + "/s"
+                )
+                if lastIterationAction is not None:
+                    decision += ", action " + str(lastIterationAction["action"])
+            frameHistory.annotate(decision)
+
         lastScreen = screen
         lastState = state
 
-        time.sleep(actionDelay if state == State.INGAME else menuChangeDelay)
+        if state == State.INGAME:
+            clock.sleep(actionDelay)
+        else:
+            # continue as soon as the next screen is shown
+            waitForScreen(
+                [
+                    nextScreen
+                    for nextScreen in Screen
+                    if nextScreen
+                    not in [screen, Screen.UNKNOWN, Screen.BTD6_UNFOCUSED]
+                ],
+                captureCompareAreas,
+                comparisonRois,
+                menuChangeDelay,
+                recognizer=screenRecognizer,
+            )
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except RecordedSessionEnded:
+        customPrint("end of the recorded session! exiting!")